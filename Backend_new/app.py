@@ -1,22 +1,237 @@
-from fastapi import FastAPI, Body, BackgroundTasks
-from helper_functions import *
-from helper_functions.db_handler import SupabaseHandler
+from fastapi import FastAPI, Body, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from helper_functions import (
+    AGE_ERROR_MESSAGE,
+    DIFFERENTIAL_DIAGONOSIS_GENERATION_PROMPT,
+    GENDER_ERROR_MESSAGE,
+    QUESTION_GENERATION_PROMPT_B2B,
+    STATIC_PHRASES,
+    SYMPTOMS_ERROR_MESSAGE,
+)
+from helper_functions import config, debug_dump, gemini_client, metrics, tts, warmup
+from helper_functions.audio import decode_audio
+from helper_functions.executor import run_blocking, shutdown_executor
+from helper_functions.governor import CONTINUING, Overloaded, set_priority
+from helper_functions.session_store import create_session_store, new_consultation_id
+from helper_functions.streaming import (
+    NDJSON_MEDIA_TYPE,
+    SSE_MEDIA_TYPE,
+    ndjson_event,
+    sse_event,
+)
+from helper_functions.cache import content_hash
+from helper_functions.jobs import JobQueue
+from helper_functions.patient_context import patient_context
+from helper_functions.task_pool import PoolFull, TaskPool
+from helper_functions.worker import start_workers, stop_workers
+from helper_functions.uploads import (
+    form_json,
+    is_audio_body,
+    is_multipart,
+    read_audio_body,
+    read_form,
+    read_json_object,
+    read_upload_file,
+)
 from helper_functions.Gemini_handler import (
-    transcribe_audio_with_gemini,
-)  # Explicitly import
+    Process_parts_with_Gemini_async,
+    Process_voice_with_Gemini_async,
+    generate_with_gemini_async,
+    response_cache,
+    stream_parts_with_gemini_async,
+    stream_questions_with_gemini_async,
+    validate_and_transcribe_with_gemini_async,
+    validation_prompt,
+)
+from helper_functions.tts import text_to_speech_async, text_to_speech_ordered_async
 from dotenv import load_dotenv
+from contextlib import asynccontextmanager
+import asyncio
 import json
 from datetime import datetime
 
 load_dotenv()
 
-app = FastAPI()
 
-supabase_handler = SupabaseHandler()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global job_queue, session_store
+    # Nothing touches the network or disk at import time; it all starts here
+    job_queue = JobQueue()
+    session_store = create_session_store()
+    # Diagnosis job states go to the session backend too, so that with
+    # several workers any of them can answer a poll
+    diagnosis_store = create_session_store(
+        ttl=config.DIAGNOSIS_RESULT_TTL, prefix="diagnosis_job:"
+    )
+    # SDK preload, connection warmup and static prompt rendering run while
+    # the app already serves; /ready reports when they are done
+    warming = asyncio.create_task(warmup.warm_up(STATIC_PHRASES))
+    workers = start_workers()
+    diagnosis_pool.start(diagnosis_store)
+    loop_monitor = None
+    if config.METRICS_LOOP_LAG_INTERVAL > 0:
+        loop_monitor = asyncio.create_task(
+            metrics.monitor_event_loop(config.METRICS_LOOP_LAG_INTERVAL)
+        )
+    yield
+    warmup.state["ready"] = False
+    warming.cancel()
+    if loop_monitor is not None:
+        loop_monitor.cancel()
+    await diagnosis_pool.close()
+    await diagnosis_store.close()
+    # Running jobs finish or are re-delivered once their lease lapses
+    stop_workers(workers)
+    job_queue.close()
+    # Release the shared upstream connection pools
+    await gemini_client.aclose_client()
+    await tts.aclose_client()
+    await debug_dump.drain()
+    await session_store.close()
+    shutdown_executor()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    # Shed load quickly instead of queueing behind an upstream backlog
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Service is busy, retry later."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+job_queue = None  # created in lifespan
+diagnosis_pool = TaskPool(
+    workers=config.DIAGNOSIS_WORKERS,
+    max_queue=config.DIAGNOSIS_MAX_QUEUE,
+    ttl=config.DIAGNOSIS_RESULT_TTL,
+    max_entries=config.DIAGNOSIS_MAX_RESULTS,
+    poll_interval=config.DIAGNOSIS_POLL_INTERVAL,
+)
+session_store = None  # created in lifespan
+
+
+async def enqueue_initial_data(payload: dict, data: dict, transcript: str = None):
+    """
+    Queue transcription (when still needed) and the history/patient inserts
+    as a durable job. A retried request (same email and audio within
+    JOB_DEDUPE_WINDOW) maps to the job already queued for it. The audio
+    itself is only stored, as raw bytes, while it still has to be
+    transcribed.
+
+    Returns:
+        str: job id, pollable at /jobs/{job_id}
+    """
+    email = payload.get("email", "")
+    try:
+        audio = decode_audio(payload.get("voice_data") or b"")
+    except ValueError:
+        audio = b""
+    return await job_queue.enqueue(
+        "process_initial_data",
+        {
+            "email": email,
+            "patient_data": data,
+            "transcript": transcript,
+        },
+        idempotency_key=content_hash("process_initial_data", email, audio),
+        attachment=audio if transcript is None else None,
+    )
+
+
+async def validate_initial_voice(payload: dict):
+    """
+    Extract and validate patient details from the initial voice message.
+
+    Returns:
+        tuple: (patient data dict, transcript or None, error message or None)
+    """
+    voice = payload.get("voice_data")
+    with metrics.stage("validation"):
+        if config.GEMINI_COMBINED_INITIALIZE:
+            # One model call returns the validated fields and the transcript
+            data, transcript = await validate_and_transcribe_with_gemini_async(voice)
+        else:
+            data = await Process_voice_with_Gemini_async(voice, validation_prompt)
+            transcript = None
+    print(data)
+
+    if data.get("age") == None:
+        print(AGE_ERROR_MESSAGE)
+        return data, transcript, AGE_ERROR_MESSAGE
+
+    if data.get("Gender") == None:
+        print("Gender not provided.")
+        return data, transcript, GENDER_ERROR_MESSAGE
+
+    if data.get("symptoms") == None:
+        print(SYMPTOMS_ERROR_MESSAGE)
+        return data, transcript, SYMPTOMS_ERROR_MESSAGE
+
+    # The patient row is written once, by the process_initial_data job
+    return data, transcript, None
+
+
+async def start_consultation(
+    payload: dict, data: dict, transcript: str = None, job_id: str = None
+):
+    """
+    Open a server-side session so /generate_diagnosis only needs the answers.
+
+    Returns:
+        str: consultation id to hand back to the client
+    """
+    consultation_id = new_consultation_id()
+    await session_store.set(
+        consultation_id,
+        {
+            "email": payload.get("email", ""),
+            "user_data": data,
+            "transcript": transcript,
+            "job_id": job_id,
+            "questions": [],
+        },
+    )
+    return consultation_id
+
+
+async def generate_questions(data: dict):
+    feedback_questions = await generate_with_gemini_async(
+        patient_context(data), QUESTION_GENERATION_PROMPT_B2B
+    )
+    return feedback_questions.get("questions", [])
+
+
+async def question_audio_stream(data: dict):
+    """
+    Yield ``(index, {"text", "audio"})`` for each follow-up question in order.
+
+    With PIPELINED_QUESTION_TTS, questions are read off Gemini's streamed
+    output and each one goes to TTS as soon as it is complete, so question
+    generation and speech synthesis overlap.
+    """
+    with metrics.stage("questions") as timer:
+        if config.PIPELINED_QUESTION_TTS:
+            questions = stream_questions_with_gemini_async(
+                patient_context(data), QUESTION_GENERATION_PROMPT_B2B
+            )
+        else:
+            questions = await generate_questions(data)
+        async for index, item in text_to_speech_ordered_async(
+            questions, language=data.get("detected_language", "English")
+        ):
+            with timer.paused():
+                yield index, item
 
 
 @app.post("/initialize")
-async def initialize_chat(background_tasks: BackgroundTasks, payload: dict = Body(...)):
+async def initialize_chat(payload: dict = Body(...)):
     """
     Expected payload:
     {
@@ -33,108 +248,160 @@ async def initialize_chat(background_tasks: BackgroundTasks, payload: dict = Bod
     success output:
     {
         "status": "success",
+        "consultation_id": "id to pass to /generate_diagnosis",
+        "job_id": "background job storing the transcript, see /jobs/{job_id}",
         "questions": [q1, q2, ...]
     }
 
     """
 
-    voice = payload.get("voice_data")
-    base64_to_audio_file(voice, "user_voice.mp3")
-    data = Process_voice_with_Gemini(voice, validation_prompt)
-    print(data)
+    return await initialize_response(payload)
 
-    # Define background tasks
-    def process_initial_data(email: str, voice_data: str, patient_data: dict):
-        # Transcribe user's initial voice input
-        user_transcript = transcribe_audio_with_gemini(voice_data)
 
-        # Prepare conversation history entry
-        conversation_entry = {
-            "email": email,
-            "conversation_history": {
-                "AI": "Hi Welcome to Medconcious Chat, Please state your patient's Name, Age , Gender and the Symptoms they are experiencing. Share any additional Information that will help the diagnosis",
-                "Doctor": user_transcript,
-            },
-        }
-        # Insert conversation history
-        history_response = supabase_handler.conversation_history(conversation_entry)
-        if history_response:
-            print(
-                f"Conversation history inserted successfully: {history_response.data}"
-            )
-        else:
-            print("Failed to insert conversation history.")
+def dump_initial_voice(request_id: str, payload: dict):
+    if debug_dump.enabled():
+        debug_dump.dump(request_id, "user_voice", decode_audio(payload.get("voice_data")))
 
-        # Construct patient data for Supabase
-        patient_data_to_insert = {
-            "email": email,
-            "age": patient_data.get("age"),
-            "gender": patient_data.get("Gender"),
-            "symptoms": patient_data.get("symptoms"),
-            "additional_info": patient_data.get("additional_info", None),
-        }
-
-        # Insert patient information into Supabase
-        patient_insert_response = supabase_handler.insert_patient_info(
-            patient_data_to_insert
-        )
-        if patient_insert_response:
-            print(f"Patient info inserted successfully: {patient_insert_response.data}")
-        else:
-            print("Failed to insert patient info.")
 
-    # Add the processing to background tasks
-    background_tasks.add_task(
-        process_initial_data, payload.get("email", ""), voice, data
+async def initialize_response(payload: dict):
+    request_id = debug_dump.new_request_id()
+    dump_initial_voice(request_id, payload)
+    data, transcript, error = await validate_initial_voice(payload)
+    # Transcript and history/patient rows are handled by the job workers
+    job_id = await enqueue_initial_data(payload, data, transcript)
+    if error:
+        return {"status": "error", "message": await text_to_speech_async(error)}
+
+    # From here on the consultation is under way and its calls go first
+    set_priority(CONTINUING)
+    consultation_id = await start_consultation(payload, data, transcript, job_id)
+    audio_list = [item async for _, item in question_audio_stream(data)]
+    print("Audio generation completed for all texts.")
+    await session_store.update(
+        consultation_id, questions=[item["text"] for item in audio_list]
     )
 
-    if data.get("age") == None:
-        print("Age not provided or invalid.")
-        return {
-            "status": "error",
-            "message": text_to_speech("Age not provided or invalid."),
-        }
+    datafinal = {
+        "status": "success",
+        "consultation_id": consultation_id,
+        "job_id": job_id,
+        "questions": audio_list,
+        "user_data": data,
+    }
+    debug_dump.dump(request_id, "user_data.json", datafinal)
+    return datafinal
 
-    if data.get("Gender") == None:
-        print("Gender not provided.")
-        return {
-            "status": "error",
-            "message": text_to_speech("Please provide patient Gender details."),
-        }
 
-    if data.get("symptoms") == None:
-        print("Symptoms not provided or invalid.")
-        return {
-            "status": "error",
-            "message": text_to_speech("Symptoms not provided or invalid."),
-        }
-    # Construct patient data for Supabase
-    patient_data_to_insert = {
-        "email": payload.get("email", ""),  # Assuming email is in the payload
-        "age": data.get("age"),
-        "gender": data.get("Gender"),
-        "symptoms": data.get("symptoms"),
-        "additional_info": data.get("additional_info", None),
-    }
+@app.post("/initialize/stream")
+async def initialize_chat_stream(payload: dict = Body(...)):
+    """
+    Streaming variant of /initialize. Same payload, newline-delimited JSON
+    response with one event per line:
 
-    # Insert patient information into Supabase
-    response = supabase_handler.insert_patient_info(patient_data_to_insert)
-    if response:
-        print(f"Patient info inserted successfully: {response.data}")
-    else:
-        print("Failed to insert patient info.")
+    {"type": "user_data", "consultation_id": "...", "job_id": "...", "user_data": {...}}
+    {"type": "question", "index": 0, "text": "...", "audio": "base64"}
+    ...
+    {"type": "done"}
 
-    feedback_questions = generate_with_gemini(str(data), QUESTION_GENERATION_PROMPT_B2B)
-    feedback_questions = feedback_questions.get("questions", [])
-    speech_data = text_to_speech_concurrent(
-        feedback_questions, language=data.get("detected_language", "English")
-    )
-    audio_list = speech_data.get("data", [])
+    or, when validation fails:
 
-    datafinal = {"status": "success", "questions": audio_list, "user_data": data}
-    with open("user_data.json", "w") as f:
-        json.dump(datafinal, f, indent=4)
-    return datafinal
+    {"type": "error", "message": "Error message in base64 encoded audio format"}
+
+    A failure after the first line ends the stream with a text error instead
+    of "done" (with "retry_after" in seconds when the service is overloaded):
+
+    {"type": "error", "message": "...", "retry_after": 3}
+
+    Questions are emitted in order, each as soon as its audio is ready.
+    """
+
+    return await initialize_stream_response(payload)
+
+
+async def initialize_stream_response(payload: dict):
+    dump_initial_voice(debug_dump.new_request_id(), payload)
+    data, transcript, error = await validate_initial_voice(payload)
+    job_id = await enqueue_initial_data(payload, data, transcript)
+    if not error:
+        set_priority(CONTINUING)
+
+    async def events():
+        if error:
+            yield ndjson_event(
+                {"type": "error", "message": await text_to_speech_async(error)}
+            )
+            return
+        try:
+            consultation_id = await start_consultation(payload, data, transcript, job_id)
+            yield ndjson_event(
+                {
+                    "type": "user_data",
+                    "consultation_id": consultation_id,
+                    "job_id": job_id,
+                    "user_data": data,
+                }
+            )
+
+            questions = []
+            async for index, item in question_audio_stream(data):
+                questions.append(item["text"])
+                yield ndjson_event({"type": "question", "index": index, **item})
+            await session_store.update(consultation_id, questions=questions)
+        except Overloaded as e:
+            print(f"Streaming initialize shed: {e}")
+            yield ndjson_event(
+                {
+                    "type": "error",
+                    "message": "Service busy, please retry.",
+                    "retry_after": e.retry_after,
+                }
+            )
+            return
+        except Exception as e:
+            # Headers are already sent; end the body with an error line
+            # rather than truncating it
+            print(f"Streaming initialize failed: {e!r}")
+            yield ndjson_event({"type": "error", "message": "Initialization failed, please retry."})
+            return
+        yield ndjson_event({"type": "done"})
+
+    return StreamingResponse(events(), media_type=NDJSON_MEDIA_TYPE)
+
+
+@app.post("/initialize/upload")
+async def initialize_chat_upload(
+    request: Request,
+    email: str = "",
+    stream: bool = False,
+):
+    """
+    Binary-upload variant of /initialize (and of /initialize/stream with
+    ?stream=true), without base64 inflation. Accepts either:
+
+    - a raw body with Content-Type audio/* (email as a query parameter), or
+    - multipart/form-data with a "voice_data" file part and an optional
+      "email" field.
+
+    Audio is capped at MAX_AUDIO_UPLOAD_BYTES. Output matches /initialize.
+    """
+    if is_audio_body(request):
+        voice = await read_audio_body(request)
+    elif is_multipart(request):
+        form = await read_form(request)
+        try:
+            voice = await read_upload_file(form.get("voice_data"))
+            email = form.get("email", email)
+        finally:
+            await form.close()
+    else:
+        raise HTTPException(
+            status_code=415, detail="Send audio/* or multipart/form-data."
+        )
+
+    payload = {"voice_data": voice, "email": email}
+    if stream:
+        return await initialize_stream_response(payload)
+    return await initialize_response(payload)
 
 
 # @app.post("/generate_diagnosis")
@@ -206,16 +473,257 @@ async def initialize_chat(background_tasks: BackgroundTasks, payload: dict = Bod
 #         "message": "Diagnosis processing initiated in background.",
 #     }
 
+async def load_consultation(consultation_id: str):
+    session = await session_store.get(consultation_id)
+    if session is None:
+        raise HTTPException(
+            status_code=404, detail="Unknown or expired consultation_id."
+        )
+    return session
+
+
+def answered_questions(session: dict, answers: list):
+    """
+    Pair the session's question texts with the client's answer audio, in order.
+    """
+    questions = session.get("questions", [])
+    if not isinstance(questions, list):
+        raise HTTPException(status_code=400, detail="questions must be a list.")
+    if not isinstance(answers, list):
+        raise HTTPException(status_code=400, detail="answers must be a list.")
+    if len(answers) != len(questions):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Expected {len(questions)} answers, got {len(answers)}.",
+        )
+    return [{"text": text, "audio": audio} for text, audio in zip(questions, answers)]
+
+
+def checked_parts(data, user_data):
+    """
+    Reject question/answer parts and patient data the diagnosis call cannot
+    use, before any upstream call is made or job queued for them.
+
+    Returns:
+        tuple: (data, user_data) unchanged
+    """
+    if not isinstance(data, list):
+        raise HTTPException(status_code=400, detail="questions must be a list.")
+    for index, item in enumerate(data):
+        if not (
+            isinstance(item, dict)
+            and isinstance(item.get("text"), str)
+            and isinstance(item.get("audio"), (str, bytes))
+            and item["audio"]
+        ):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Question {index} needs a 'text' string and non-empty 'audio'.",
+            )
+    if not isinstance(user_data, dict):
+        raise HTTPException(status_code=400, detail="user_data must be an object.")
+    return data, user_data
+
+
+async def diagnosis_request(payload: dict):
+    """
+    Resolve a /generate_diagnosis JSON payload.
+
+    Returns:
+        tuple: (question/answer parts, patient data)
+    """
+    if payload.get("consultation_id"):
+        session = await load_consultation(payload["consultation_id"])
+        data = answered_questions(session, payload.get("answers", []))
+        user_data = session.get("user_data", {})
+    else:
+        data = payload.get("questions", [])
+        user_data = payload.get("user_data", {})
+    return checked_parts(data, user_data)
+
+
+async def diagnosis_upload_request(request: Request):
+    """
+    Resolve a multipart /generate_diagnosis/upload body.
+
+    Returns:
+        tuple: (question/answer parts, patient data)
+    """
+    form = await read_form(request)
+    try:
+        answers = [await read_upload_file(upload) for upload in form.getlist("audio")]
+        consultation_id = form.get("consultation_id")
+        if not consultation_id:
+            user_data = form_json(form, "user_data", {})
+            session = {"questions": form_json(form, "questions", [])}
+    finally:
+        await form.close()
+    if consultation_id:
+        session = await load_consultation(consultation_id)
+        user_data = session.get("user_data", {})
+    return checked_parts(answered_questions(session, answers), user_data)
+
+
+def diagnosis_prompt(user_data: dict):
+    return DIFFERENTIAL_DIAGONOSIS_GENERATION_PROMPT.replace(
+        "[[patient_details]]", patient_context(user_data)
+    )
+
+
+async def run_diagnosis(data: list, user_data: dict):
+    set_priority(CONTINUING)
+    with metrics.stage("diagnosis"):
+        return await Process_parts_with_Gemini_async(data, diagnosis_prompt(user_data))
+
+
+def diagnosis_stream_response(data: list, user_data: dict):
+    set_priority(CONTINUING)
+
+    async def events():
+        index = 0
+        try:
+            with metrics.stage("diagnosis") as timer:
+                async for kind, key, value in stream_parts_with_gemini_async(
+                    data, diagnosis_prompt(user_data)
+                ):
+                    if kind == "item" and key == "differential_diagnosis":
+                        with timer.paused():
+                            yield sse_event({"index": index, **value}, event="diagnosis")
+                        index += 1
+                    elif kind == "value":
+                        with timer.paused():
+                            yield sse_event(value, event=key)
+        except Exception as e:
+            print(f"Streaming diagnosis failed: {e!r}")
+            yield sse_event({"message": "Diagnosis failed, please retry."}, event="error")
+            return
+        yield sse_event({"count": index}, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/generate_diagnosis")
 async def generate_diagnosis(payload: dict = Body(...)):
-    with open("user_data.json", "w") as f:
-        json.dump(payload, f)
-    file = "user_data.json"
-    object = json.load(open(file, "r"))
-    data = object.get("questions", [])
-    diagnosis = Process_parts_with_Gemini(data, DIFFERENTIAL_DIAGONOSIS_GENERATION_PROMPT.replace("[[patient_details]]", str(object.get("user_data", {}))))
-    # diagnosis = Process_parts_with_Gemini(payload, DIFFERENTIAL_DIAGONOSIS_GENERATION_PROMPT.replace("[[patient_details]]", str(payload.get("user_data", {}))))
-    return diagnosis
+    """
+    Expected payload, either the consultation returned by /initialize:
+    {
+        "consultation_id": "...",
+        "answers": ["base64_encoded_answer_audio", ...]  (one per question, in order)
+    }
+
+    or the full conversation:
+    {
+        "user_data": {...},
+        "questions": [{"text": "...", "audio": "base64_encoded_audio"}, ...]
+    }
+    """
+    debug_dump.dump(debug_dump.new_request_id(), "user_data.json", payload)
+    data, user_data = await diagnosis_request(payload)
+    return await run_diagnosis(data, user_data)
+
+
+@app.post("/generate_diagnosis/stream")
+async def generate_diagnosis_stream(payload: dict = Body(...)):
+    """
+    Streaming variant of /generate_diagnosis. Same payload, Server-Sent
+    Events response:
+
+    event: patient_information
+    data: {"name": "...", "age": "...", ...}
+
+    event: diagnosis
+    data: {"index": 0, "disease": "...", "probability": 75, "reasoning": {...}}
+    ...
+
+    event: done
+    data: {"count": 3}
+
+    Each diagnosis is sent as soon as Gemini has finished generating it, in
+    the model's order (most likely first). If generation fails midway an
+    "error" event ({"message": "..."}) is sent instead of "done".
+    """
+    debug_dump.dump(debug_dump.new_request_id(), "user_data.json", payload)
+    data, user_data = await diagnosis_request(payload)
+    return diagnosis_stream_response(data, user_data)
+
+
+@app.post("/generate_diagnosis/upload")
+async def generate_diagnosis_upload(request: Request, stream: bool = False):
+    """
+    Multipart variant of /generate_diagnosis (and of
+    /generate_diagnosis/stream with ?stream=true) with binary audio parts:
+
+    - "consultation_id": id returned by /initialize, or instead
+      "user_data" (JSON-encoded patient data) and "questions" (JSON-encoded
+      list of question texts)
+    - "audio": one answer file part per question, in the same order
+
+    Each audio part is capped at MAX_AUDIO_UPLOAD_BYTES.
+    """
+    if not is_multipart(request):
+        raise HTTPException(status_code=415, detail="Send multipart/form-data.")
+    data, user_data = await diagnosis_upload_request(request)
+    if stream:
+        return diagnosis_stream_response(data, user_data)
+    return await run_diagnosis(data, user_data)
+
+
+@app.post("/generate_diagnosis/jobs", status_code=202)
+async def submit_diagnosis(request: Request):
+    """
+    Start a diagnosis without holding the connection open. Takes the JSON
+    payload of /generate_diagnosis or the multipart body of
+    /generate_diagnosis/upload and answers at once with:
+    {
+        "job_id": "...",
+        "status": "queued"
+    }
+
+    Poll GET /generate_diagnosis/jobs/{job_id} for the result. When
+    DIAGNOSIS_MAX_QUEUE jobs are already waiting, responds 503 with a
+    Retry-After header.
+    """
+    if is_multipart(request):
+        data, user_data = await diagnosis_upload_request(request)
+    else:
+        payload = await read_json_object(request)
+        debug_dump.dump(debug_dump.new_request_id(), "user_data.json", payload)
+        data, user_data = await diagnosis_request(payload)
+    try:
+        job_id = await diagnosis_pool.submit(run_diagnosis, data, user_data)
+    except PoolFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many diagnoses in progress, retry later.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/generate_diagnosis/jobs/{job_id}")
+async def diagnosis_job(job_id: str, wait: float = Query(0, allow_inf_nan=False)):
+    """
+    Poll a diagnosis job. With ``?wait=N`` (long-poll, capped at
+    DIAGNOSIS_MAX_WAIT) the response is held until the job finishes or N
+    seconds pass, whichever is first.
+
+    output:
+    {
+        "job_id": "...",
+        "status": "queued" | "running" | "succeeded" | "failed",
+        "result": {...diagnosis...} when succeeded,
+        "error": "..." when failed,
+        "created_at": ..., "started_at": ..., "finished_at": ...
+    }
+    """
+    job = await diagnosis_pool.wait(job_id, min(max(wait, 0), config.DIAGNOSIS_MAX_WAIT))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job_id.")
+    return job
 
 
 @app.get("/health")
@@ -223,7 +731,66 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe, distinct from the /health liveness probe: 503 until
+    this worker has loaded the provider SDKs, warmed its upstream
+    connections and rendered the static prompts, so a load balancer only
+    routes to warm workers.
+    """
+    if not warmup.state["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready", **warmup.state}
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Prometheus scrape endpoint: request, stage and upstream latency
+    histograms, payload sizes, and cache / write-queue counters.
+
+    Counters are per process: under gunicorn.conf.py each scrape reports
+    only the worker that answered it, so scrape every worker (or aggregate
+    by instance) rather than the shared port.
+    """
+    gemini = response_cache.stats()
+    metrics.cache_events.set(gemini["hits"] - gemini["disk_hits"], cache="gemini", result="memory_hit")
+    metrics.cache_events.set(gemini["disk_hits"], cache="gemini", result="disk_hit")
+    metrics.cache_events.set(gemini["misses"], cache="gemini", result="miss")
+    metrics.cache_bytes.set(gemini["bytes"], cache="gemini")
+    metrics.cache_bytes.set(tts.speech_cache.total_bytes, cache="tts")
+    for status, count in (await job_queue.counts()).items():
+        metrics.jobs.set(count, status=status)
+    pool = diagnosis_pool.stats()
+    metrics.diagnosis_jobs.set(pool["queued"], status="queued")
+    metrics.diagnosis_jobs.set(pool["running"], status="running")
+    return Response(metrics.render(), media_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """
+    Status of a background job: queued, running, succeeded or failed, with
+    the attempt count, last error and result.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job_id.")
+    return job
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "gemini": response_cache.stats(),
+        "tts": {"entries": len(tts.speech_cache), "bytes": tts.speech_cache.total_bytes},
+    }
+
+
 if __name__ == "__main__":
+    # Single process for development; for production use the pre-fork
+    # mode: gunicorn -c gunicorn.conf.py app:app
     import uvicorn
 
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,217 @@
+"""
+Cold-start benchmark for the app.
+
+For each run a fresh interpreter measures how long ``import app`` takes, then
+a fresh uvicorn process is started against the fake upstreams
+(benchmarks/fake_upstreams.py) and timed until:
+
+- live: /health first answers (lifespan startup finished),
+- ready: /ready first answers 200 (SDKs loaded, connections warmed, static
+  prompts rendered), and
+- first request: the first /initialize, sent as soon as /health answers,
+  completes, i.e. time-to-first-request from process start, including any
+  SDK loading that request still pays.
+
+Results (median / min / max over the runs) are written as JSON.
+
+Example:
+    python benchmarks/cold_start.py --runs 5 --output cold_start.json
+    python benchmarks/cold_start.py --no-preload   # SDKs load on first request
+    python benchmarks/cold_start.py --no-prerender # skip static prompt TTS
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import httpx
+
+from fake_upstreams import add_arguments, profile_from_args
+from run import (
+    APP_DIR,
+    BENCHMARK_DIR,
+    SAMPLE_DATA,
+    app_environment,
+    free_port,
+    start_process,
+    stop_process,
+    wait_until_up,
+)
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def import_seconds(env):
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def poll_ready(url, process, started, timeout):
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"app exited with status {process.returncode} during startup")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError(f"app did not come up within {timeout:.0f}s")
+
+
+def cold_start(env, voice, timeout, log):
+    """
+    One cold start: spawn the app, wait for /health, then send one
+    /initialize while polling /ready.
+
+    Returns:
+        dict: live, ready and first-request timings in seconds, from process start
+    """
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    pool = ThreadPoolExecutor(max_workers=1)
+    started = time.perf_counter()
+    process = start_process(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        env=env,
+        log=log,
+    )
+    try:
+        live = poll_ready(f"{base_url}/health", process, started, timeout)
+        ready = pool.submit(poll_ready, f"{base_url}/ready", process, started, timeout)
+        request_start = time.perf_counter()
+        response = httpx.post(
+            f"{base_url}/initialize",
+            json={"voice_data": voice, "email": "cold-start@example.com"},
+            timeout=timeout,
+        )
+        finished = time.perf_counter()
+        ok = response.status_code == 200 and response.json().get("status") == "success"
+        ready = ready.result()
+    finally:
+        stop_process(process)
+        pool.shutdown(wait=True)
+    return {
+        "live_seconds": live,
+        "ready_seconds": ready,
+        "first_request_seconds": finished - started,
+        "first_request_latency_seconds": finished - request_start,
+        "ok": ok,
+    }
+
+
+def summarize(values):
+    return {
+        "median": statistics.median(values),
+        "min": min(values),
+        "max": max(values),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to time (default 5)")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Set PRELOAD_ON_STARTUP=0 so SDKs load on the first request")
+    parser.add_argument("--no-prerender", action="store_true",
+                        help="Set TTS_PRERENDER_STATIC=0 so static prompts are not rendered")
+    parser.add_argument("--timeout", type=float, default=60.0,
+                        help="Seconds to wait for startup and the first request (default 60)")
+    parser.add_argument("--sample-data", default=SAMPLE_DATA,
+                        help="Voice message source (default sample_data.json)")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    parser.add_argument("--app-log", help="Append app and upstream output to this file")
+    parser.set_defaults(cache=False)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    with open(args.sample_data) as f:
+        voice = json.load(f)["data"][0]["audio_base64"]
+
+    profiles = {name: profile_from_args(args, name) for name in ("gemini", "tts", "db")}
+    log = open(args.app_log, "ab") if args.app_log else None
+    upstream_port = free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    command = [sys.executable, os.path.join(BENCHMARK_DIR, "fake_upstreams.py"),
+               "--port", str(upstream_port), "--questions", str(args.questions)]
+    for name, profile in profiles.items():
+        command += [f"--{name}-median", str(profile.median),
+                    f"--{name}-sigma", str(profile.sigma),
+                    f"--{name}-error-rate", str(profile.error_rate)]
+    upstreams = start_process(command, log=log)
+
+    env = app_environment(upstream_url, args)
+    env["JOB_WORKER_PROCESSES"] = "0"
+    if args.no_preload:
+        env["PRELOAD_ON_STARTUP"] = "0"
+    if args.no_prerender:
+        env["TTS_PRERENDER_STATIC"] = "0"
+
+    runs = []
+    try:
+        wait_until_up(f"{upstream_url}/stats", upstreams)
+        for i in range(args.runs):
+            run = {"import_seconds": import_seconds(env)}
+            run.update(cold_start(env, voice, args.timeout, log))
+            runs.append(run)
+            print(
+                f"run {i + 1}: import {run['import_seconds']:.3f}s, "
+                f"live {run['live_seconds']:.3f}s, ready {run['ready_seconds']:.3f}s, "
+                f"first request done {run['first_request_seconds']:.3f}s "
+                f"({run['first_request_latency_seconds']:.3f}s latency)"
+                + ("" if run["ok"] else " FAILED"),
+                file=sys.stderr,
+            )
+    finally:
+        stop_process(upstreams)
+        if log:
+            log.close()
+
+    report = {
+        "started_at": started_at,
+        "python": platform.python_version(),
+        "settings": {
+            "runs": args.runs,
+            "preload": not args.no_preload,
+            "prerender": not args.no_prerender,
+            "upstreams": {name: profile.to_dict() for name, profile in profiles.items()},
+        },
+        "summary": {
+            field: summarize([run[field] for run in runs])
+            for field in (
+                "import_seconds",
+                "live_seconds",
+                "ready_seconds",
+                "first_request_seconds",
+                "first_request_latency_seconds",
+            )
+        },
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Local stand-ins for Gemini, OpenAI text-to-speech and Supabase (PostgREST),
+so the app can be load-tested without network access or API keys.
+
+Each upstream has a latency profile (log-normal around a median) and an
+error rate. Errors are answered with the status the real service uses when
+overloaded (503 for Gemini and Supabase, 429 for OpenAI).
+
+Routes:
+    POST /v1beta/models/{model}:generateContent
+    POST /v1beta/models/{model}:streamGenerateContent?alt=sse
+    GET  /v1beta/models/{model}
+    POST /v1/audio/speech
+    GET  /v1/models/{model}
+    POST /rest/v1/{table}
+    GET  /rest/v1/{table}
+
+Run standalone:
+    python benchmarks/fake_upstreams.py --port 9100 --gemini-median 0.8
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+
+class LatencyProfile:
+    """
+    Log-normal latency with the given median and shape, plus a failure rate.
+
+    Args:
+        median (float): Median latency in seconds
+        sigma (float): Log-normal shape; 0 gives a constant latency
+        error_rate (float): Probability in [0, 1] that a call fails
+    """
+
+    def __init__(self, median, sigma=0.0, error_rate=0.0):
+        self.median = median
+        self.sigma = sigma
+        self.error_rate = error_rate
+
+    def sample(self):
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(random.gauss(0.0, self.sigma))
+
+    def fails(self):
+        return random.random() < self.error_rate
+
+    def to_dict(self):
+        return {"median": self.median, "sigma": self.sigma, "error_rate": self.error_rate}
+
+
+def _system_text(body):
+    instruction = body.get("systemInstruction") or body.get("system_instruction") or {}
+    return " ".join(part.get("text", "") for part in instruction.get("parts", []))
+
+
+def gemini_reply(body, questions=3):
+    """
+    Canned model output shaped like what the app's prompts ask for.
+    """
+    system = _system_text(body)
+    if "JSON SCHEMA" in system:
+        data = {
+            "age": 42,
+            "Gender": "FEMALE",
+            "symptoms": "Fever and dry cough for three days",
+            "additional_info": "No known allergies",
+            "detected_language": "English",
+        }
+        if "transcript" in system:
+            data["transcript"] = "My patient is 42, female, with fever and a dry cough."
+        return json.dumps(data)
+    if "Question Generator" in system:
+        return json.dumps(
+            {"questions": [f"Benchmark question {i + 1}?" for i in range(questions)]}
+        )
+    if "Differential Diagnosis" in system:
+        return json.dumps(
+            {
+                "patient_information": {"age": "42", "gender": "FEMALE"},
+                "differential_diagnosis": [
+                    {"disease": name, "probability": p, "reasoning": "Benchmark."}
+                    for name, p in (("Influenza", 0.6), ("COVID-19", 0.3), ("Pneumonia", 0.1))
+                ],
+            }
+        )
+    return "My patient is 42, female, with fever and a dry cough."
+
+
+def _prompt_tokens(body):
+    # Roughly how Gemini counts: ~4 characters of text a token, 32 tokens a
+    # second of 16 kHz WAV audio (~43 KB of base64)
+    tokens = 0
+    for content in body.get("contents", []) + [body.get("systemInstruction") or {}]:
+        for part in content.get("parts", []):
+            tokens += len(part.get("text", "")) // 4
+            tokens += len((part.get("inlineData") or {}).get("data", "")) // 1350
+    return tokens
+
+
+def _candidate(text, finished=True, prompt_tokens=0, output_tokens=0):
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if finished:
+        candidate["finishReason"] = "STOP"
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": output_tokens},
+    }
+
+
+def _error(status, message):
+    return JSONResponse(
+        {"error": {"code": status, "message": message, "status": "UNAVAILABLE"}},
+        status_code=status,
+    )
+
+
+def create_app(gemini, tts, db, questions=3, stream_chunk=24, tts_bytes=24 * 1024):
+    """
+    Build the fake upstream app.
+
+    Args:
+        gemini (LatencyProfile): Gemini generateContent latency (whole response)
+        tts (LatencyProfile): OpenAI speech latency
+        db (LatencyProfile): PostgREST latency
+        questions (int): Follow-up questions the fake model generates
+        stream_chunk (int): Characters per streamed Gemini chunk
+        tts_bytes (int): Size of each synthesized "audio" response
+    """
+    app = FastAPI()
+    counts = {"gemini": 0, "tts": 0, "db": 0, "errors": 0}
+    app.state.counts = counts
+
+    @app.post("/v1beta/models/{target}")
+    async def generate_content(target: str, request: Request):
+        counts["gemini"] += 1
+        body = await request.json()
+        text = gemini_reply(body, questions)
+        usage = {"prompt_tokens": _prompt_tokens(body), "output_tokens": len(text) // 4}
+        delay = gemini.sample()
+        if gemini.fails():
+            counts["errors"] += 1
+            await asyncio.sleep(delay / 4)
+            return _error(503, "The model is overloaded.")
+
+        if target.endswith(":streamGenerateContent"):
+            chunks = [text[i : i + stream_chunk] for i in range(0, len(text), stream_chunk)]
+
+            async def events():
+                # Time to first token, then the rest spread over the chunks
+                await asyncio.sleep(delay * 0.3)
+                for i, chunk in enumerate(chunks):
+                    if i:
+                        await asyncio.sleep(delay * 0.7 / len(chunks))
+                    finished = i == len(chunks) - 1
+                    reply = _candidate(chunk, finished, **(usage if finished else {}))
+                    yield f"data: {json.dumps(reply)}\r\n\r\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(delay)
+        return _candidate(text, **usage)
+
+    @app.get("/v1beta/models/{model}")
+    async def get_model(model: str):
+        # Connection warmup only, not counted as a call
+        return {"name": f"models/{model}"}
+
+    @app.post("/v1/audio/speech")
+    async def speech(request: Request):
+        counts["tts"] += 1
+        await request.json()
+        await asyncio.sleep(tts.sample())
+        if tts.fails():
+            counts["errors"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                status_code=429,
+            )
+        return Response(b"ID3" + os.urandom(tts_bytes - 3), media_type="audio/mpeg")
+
+    @app.get("/v1/models/{model}")
+    async def retrieve_model(model: str):
+        return {"id": model, "object": "model", "created": 0, "owned_by": "system"}
+
+    @app.post("/rest/v1/{table}")
+    async def insert(table: str, request: Request):
+        counts["db"] += 1
+        rows = await request.json()
+        await asyncio.sleep(db.sample())
+        if db.fails():
+            counts["errors"] += 1
+            return _error(503, "Service unavailable")
+        rows = rows if isinstance(rows, list) else [rows]
+        return JSONResponse(
+            [{"id": str(uuid.uuid4()), **row} for row in rows], status_code=201
+        )
+
+    @app.get("/rest/v1/{table}")
+    async def select(table: str):
+        counts["db"] += 1
+        await asyncio.sleep(db.sample())
+        return []
+
+    @app.get("/stats")
+    async def stats():
+        return counts
+
+    return app
+
+
+def add_profile_arguments(parser, name, median, sigma, error_rate):
+    parser.add_argument(f"--{name}-median", type=float, default=median,
+                        help=f"Median {name} latency in seconds (default {median})")
+    parser.add_argument(f"--{name}-sigma", type=float, default=sigma,
+                        help=f"Log-normal shape of {name} latency (default {sigma})")
+    parser.add_argument(f"--{name}-error-rate", type=float, default=error_rate,
+                        help=f"Fraction of {name} calls that fail (default {error_rate})")
+
+
+def profile_from_args(args, name):
+    name = name.replace("-", "_")
+    return LatencyProfile(
+        getattr(args, f"{name}_median"),
+        getattr(args, f"{name}_sigma"),
+        getattr(args, f"{name}_error_rate"),
+    )
+
+
+def add_arguments(parser):
+    add_profile_arguments(parser, "gemini", 0.8, 0.4, 0.0)
+    add_profile_arguments(parser, "tts", 0.3, 0.3, 0.0)
+    add_profile_arguments(parser, "db", 0.03, 0.5, 0.0)
+    parser.add_argument("--questions", type=int, default=3,
+                        help="Follow-up questions per consultation (default 3)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    app = create_app(
+        profile_from_args(args, "gemini"),
+        profile_from_args(args, "tts"),
+        profile_from_args(args, "db"),
+        questions=args.questions,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
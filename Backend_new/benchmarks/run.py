@@ -0,0 +1,397 @@
+"""
+Offline load test for /initialize and /generate_diagnosis.
+
+Starts the fake upstreams (benchmarks/fake_upstreams.py) and then, for each
+concurrency level, a fresh app process pointed at them. Consultations are
+replayed from sample_data.json: one /initialize with a sample voice message,
+then one /generate_diagnosis answering every generated question with sample
+audio. Each level reports, per endpoint, throughput, error rate and
+p50/p95/p99 latency, together with the app's peak RSS, event-loop lag and
+Gemini token usage per endpoint (from /metrics). Results are written as JSON
+so runs can be compared.
+
+Caches and single-flight coalescing are disabled by default so every
+consultation reaches the upstreams (the replayed audio repeats, so identical
+concurrent calls would otherwise be merged); pass --cache to measure with
+them on.
+
+Example:
+    python benchmarks/run.py --concurrency 1 8 32 --consultations 64 \\
+        --gemini-median 0.8 --gemini-error-rate 0.01 --output bench.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+
+from fake_upstreams import add_arguments, profile_from_args
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCHMARK_DIR)
+SAMPLE_DATA = os.path.join(os.path.dirname(APP_DIR), "sample_data.json")
+
+LOOP_LAG_METRIC = "medconcious_event_loop_lag_seconds"
+TOKENS_METRIC = "medconcious_gemini_tokens"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_process(args, env=None, log=None):
+    return subprocess.Popen(
+        args,
+        cwd=APP_DIR,
+        env=env,
+        stdout=log or subprocess.DEVNULL,
+        stderr=subprocess.STDOUT if log else subprocess.DEVNULL,
+    )
+
+
+def stop_process(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def wait_until_up(url, process, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {process.returncode} during startup")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def peak_rss_bytes(pid):
+    """
+    Peak resident set size of a process (Linux), None when unavailable.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, wall_seconds):
+    """
+    Latency and throughput for one endpoint from (seconds, ok) samples.
+    """
+    latencies = sorted(seconds for seconds, ok in samples if ok)
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "throughput_rps": len(latencies) / wall_seconds if wall_seconds else 0.0,
+        "latency_seconds": {
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else None,
+        },
+    }
+
+
+def loop_lag(metrics_text):
+    """
+    Event-loop lag summary from the app's Prometheus histogram. Percentiles
+    are bucket upper bounds.
+    """
+    buckets = []
+    total = count = 0.0
+    for line in metrics_text.splitlines():
+        if line.startswith(f"{LOOP_LAG_METRIC}_bucket"):
+            bound = line.split('le="', 1)[1].split('"', 1)[0]
+            buckets.append((float(bound), float(line.rsplit(" ", 1)[1])))
+        elif line.startswith(f"{LOOP_LAG_METRIC}_sum"):
+            total = float(line.rsplit(" ", 1)[1])
+        elif line.startswith(f"{LOOP_LAG_METRIC}_count"):
+            count = float(line.rsplit(" ", 1)[1])
+    if not count:
+        return None
+
+    def bound_for(fraction):
+        for bound, cumulative in buckets:
+            if cumulative >= fraction * count:
+                return bound
+        return None
+
+    return {
+        "samples": int(count),
+        "mean_seconds": total / count,
+        "p50_seconds_le": bound_for(0.50),
+        "p99_seconds_le": bound_for(0.99),
+    }
+
+
+def gemini_tokens(metrics_text):
+    """
+    Gemini token totals and call counts per endpoint and kind, from the
+    app's token histogram.
+    """
+    tokens = {}
+    for line in metrics_text.splitlines():
+        for suffix, field in (("_sum", "total"), ("_count", "calls")):
+            if line.startswith(f"{TOKENS_METRIC}{suffix}{{"):
+                labels = dict(
+                    pair.split("=", 1) for pair in line.split("{", 1)[1].split("}", 1)[0].split(",")
+                )
+                endpoint = labels["endpoint"].strip('"')
+                kind = labels["kind"].strip('"')
+                value = float(line.rsplit(" ", 1)[1])
+                tokens.setdefault(endpoint, {}).setdefault(kind, {})[field] = int(value)
+    return tokens
+
+
+async def run_consultation(client, voices, record):
+    """
+    One /initialize followed by one /generate_diagnosis.
+    """
+    voice = next(voices)
+    start = time.perf_counter()
+    try:
+        response = await client.post(
+            "/initialize",
+            json={"voice_data": voice, "email": f"bench-{uuid.uuid4().hex[:12]}@example.com"},
+        )
+        body = response.json() if response.status_code == 200 else {}
+        ok = body.get("status") == "success"
+    except (httpx.HTTPError, ValueError):
+        body, ok = {}, False
+    record("/initialize", time.perf_counter() - start, ok)
+    if not ok:
+        return
+
+    answers = [next(voices) for _ in body.get("questions", [])]
+    start = time.perf_counter()
+    try:
+        response = await client.post(
+            "/generate_diagnosis",
+            json={"consultation_id": body["consultation_id"], "answers": answers},
+        )
+        ok = response.status_code == 200 and bool(response.json())
+    except (httpx.HTTPError, ValueError):
+        ok = False
+    record("/generate_diagnosis", time.perf_counter() - start, ok)
+
+
+async def drive(base_url, voices, concurrency, consultations, warmup, timeout):
+    """
+    Closed-loop load: ``concurrency`` workers run consultations back to back.
+    """
+    samples = {"/initialize": [], "/generate_diagnosis": []}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        for _ in range(warmup):
+            await run_consultation(client, voices, lambda *sample: None)
+
+        remaining = iter(range(consultations))
+
+        def record(endpoint, seconds, ok):
+            samples[endpoint].append((seconds, ok))
+
+        async def worker():
+            for _ in remaining:
+                await run_consultation(client, voices, record)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall_seconds = time.perf_counter() - start
+    # Fresh connection: the server closes keep-alive sockets after a 500
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+        metrics_text = (await client.get("/metrics")).text
+    return samples, wall_seconds, metrics_text
+
+
+def app_environment(upstream_url, args):
+    env = dict(os.environ)
+    env.update(
+        {
+            "GEMINI_API_KEY": "benchmark",
+            "GEMINI_BASE_URL": upstream_url,
+            "OPENAI_API_KEY": "benchmark",
+            "OPENAI_BASE_URL": f"{upstream_url}/v1",
+            "SUPABASE_URL": upstream_url,
+            "SUPABASE_KEY": "benchmark",
+            "SUPABASE_REST_URL": f"{upstream_url}/rest/v1",
+            "STORAGE_BACKEND": "supabase",
+            "SESSION_BACKEND": "memory",
+            "DEBUG_DUMP_DIR": "",
+            "JOB_QUEUE_PATH": os.path.join(tempfile.mkdtemp(prefix="bench-jobs-"), "jobs.db"),
+            "PYTHONUNBUFFERED": "1",
+        }
+    )
+    if not args.cache:
+        env.update(
+            {
+                "GEMINI_CACHE_ENABLED": "0",
+                "TTS_CACHE_MAX_BYTES": "0",
+                "SINGLE_FLIGHT_ENABLED": "0",
+            }
+        )
+    return env
+
+
+def run_level(concurrency, upstream_url, voices, args, log):
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = start_process(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        env=app_environment(upstream_url, args),
+        log=log,
+    )
+    try:
+        wait_until_up(f"{base_url}/health", process)
+        samples, wall_seconds, metrics_text = asyncio.run(
+            drive(base_url, voices, concurrency, args.consultations, args.warmup, args.timeout)
+        )
+        rss = peak_rss_bytes(process.pid)
+    finally:
+        stop_process(process)
+
+    completed = sum(ok for _, ok in samples["/generate_diagnosis"])
+    return {
+        "concurrency": concurrency,
+        "consultations": args.consultations,
+        "wall_seconds": wall_seconds,
+        "consultations_per_second": completed / wall_seconds if wall_seconds else 0.0,
+        "endpoints": {
+            endpoint: summarize(endpoint_samples, wall_seconds)
+            for endpoint, endpoint_samples in samples.items()
+        },
+        "peak_rss_bytes": rss,
+        "event_loop_lag": loop_lag(metrics_text),
+        "gemini_tokens": gemini_tokens(metrics_text),
+    }
+
+
+def print_level(result):
+    lag = result["event_loop_lag"] or {}
+    rss = result["peak_rss_bytes"]
+    rss = f"{rss / 2**20:.0f} MiB" if rss else "n/a"
+    print(
+        f"concurrency {result['concurrency']:>4}: "
+        f"{result['consultations_per_second']:.2f} consultations/s, "
+        f"peak RSS {rss}, loop lag p99 <= {lag.get('p99_seconds_le')}s",
+        file=sys.stderr,
+    )
+    for endpoint, stats in result["endpoints"].items():
+        latency = stats["latency_seconds"]
+        if latency["p50"] is None:
+            print(f"    {endpoint:<20} all {stats['requests']} requests failed", file=sys.stderr)
+            continue
+        print(
+            f"    {endpoint:<20} {stats['throughput_rps']:7.2f} req/s  "
+            f"p50 {latency['p50']:.3f}s  p95 {latency['p95']:.3f}s  "
+            f"p99 {latency['p99']:.3f}s  errors {stats['error_rate']:.1%}",
+            file=sys.stderr,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32],
+                        help="Concurrent consultations per level (default 1 8 32)")
+    parser.add_argument("--consultations", type=int, default=64,
+                        help="Measured consultations per level (default 64)")
+    parser.add_argument("--warmup", type=int, default=2,
+                        help="Unmeasured consultations before each level (default 2)")
+    parser.add_argument("--timeout", type=float, default=120.0,
+                        help="Client timeout per request in seconds (default 120)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Keep the Gemini and TTS caches and single-flight enabled")
+    parser.add_argument("--sample-data", default=SAMPLE_DATA,
+                        help="Replayed voice messages (default sample_data.json)")
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    parser.add_argument("--app-log", help="Append app and upstream output to this file")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    with open(args.sample_data) as f:
+        voices = itertools.cycle([item["audio_base64"] for item in json.load(f)["data"]])
+
+    profiles = {name: profile_from_args(args, name) for name in ("gemini", "tts", "db")}
+    log = open(args.app_log, "ab") if args.app_log else None
+    upstream_port = free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    command = [sys.executable, os.path.join(BENCHMARK_DIR, "fake_upstreams.py"),
+               "--port", str(upstream_port), "--questions", str(args.questions)]
+    for name, profile in profiles.items():
+        command += [f"--{name}-median", str(profile.median),
+                    f"--{name}-sigma", str(profile.sigma),
+                    f"--{name}-error-rate", str(profile.error_rate)]
+    upstreams = start_process(command, log=log)
+
+    results = []
+    try:
+        wait_until_up(f"{upstream_url}/stats", upstreams)
+        for concurrency in args.concurrency:
+            result = run_level(concurrency, upstream_url, voices, args, log)
+            print_level(result)
+            results.append(result)
+    finally:
+        stop_process(upstreams)
+        if log:
+            log.close()
+
+    report = {
+        "started_at": started_at,
+        "python": platform.python_version(),
+        "settings": {
+            "consultations": args.consultations,
+            "warmup": args.warmup,
+            "cache": args.cache,
+            "questions": args.questions,
+            "upstreams": {name: profile.to_dict() for name, profile in profiles.items()},
+        },
+        "levels": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Pre-fork multi-worker serving mode:
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The master imports the app and loads the shared read-only state (prompts,
+config, provider SDKs, pre-rendered static prompts) once, then forks
+WEB_CONCURRENCY uvicorn workers (default: one per core) that share it
+copy-on-write. Each worker opens its own upstream connections and warms
+them before its /ready probe passes. The job queue workers are started once
+by the master rather than by every web worker.
+
+State that must be visible to every worker lives outside the process:
+consultation sessions and the state of asynchronous diagnosis jobs default
+to SESSION_BACKEND=sqlite here (use redis across hosts). A diagnosis job
+runs in the worker that accepted it; any worker can answer its polls.
+
+Per-process limits are not multiplied by the worker count: the Gemini and
+TTS concurrency and rate budgets are split evenly between the web workers
+and the job workers (UPSTREAM_PROCESSES). Other state stays per worker,
+notably the /metrics counters: a scrape through the shared port reports
+only the worker that answered it.
+"""
+
+import multiprocessing
+import os
+
+# Read by config at import, so it must be set before it is imported
+os.environ.setdefault("SESSION_BACKEND", "sqlite")
+
+from helper_functions import config as app_config  # noqa: E402
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+
+if "UPSTREAM_PROCESSES" not in os.environ:
+    app_config.UPSTREAM_PROCESSES = workers + app_config.JOB_WORKER_PROCESSES
+    # Inherited by the job worker processes
+    os.environ["UPSTREAM_PROCESSES"] = str(app_config.UPSTREAM_PROCESSES)
+
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", 180))  # the longest diagnosis plus margin
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("KEEPALIVE", 5))
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported, before any fork
+    from helper_functions import STATIC_PHRASES, warmup
+    from helper_functions.worker import start_workers
+
+    warmup.prepare_prefork(STATIC_PHRASES)
+    server.job_workers = start_workers()
+    # The master owns the job workers; web workers must not start their own
+    app_config.JOB_WORKER_PROCESSES = 0
+    if app_config.SESSION_BACKEND == "memory" and server.cfg.workers > 1:
+        server.log.warning(
+            "SESSION_BACKEND=memory with %d workers: consultations and diagnosis "
+            "jobs will not be found by workers other than the one that started them.",
+            server.cfg.workers,
+        )
+
+
+def on_exit(server):
+    from helper_functions.worker import stop_workers
+
+    stop_workers(getattr(server, "job_workers", []))
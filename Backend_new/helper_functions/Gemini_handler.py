@@ -1,15 +1,65 @@
 import json
-import os
-from google import genai
-from google.genai import types
-import base64
-
-def generate_with_gemini(input_text, sys):
-    client = genai.Client(
-        api_key=os.environ.get("GEMINI_API_KEY"),
-    )
 
-    model = "gemini-2.5-flash"
+from . import config, gemini_client, metrics
+from .audio import prepare_audio
+from .cache import LRUCache, ResponseCache, SQLiteCache, content_hash
+from .executor import run_blocking
+from .json_stream import JSONStreamParser
+from .singleflight import SingleFlight, ThreadSingleFlight
+
+MODEL = "gemini-2.5-flash"
+PARTS_MODEL = "gemini-2.0-flash"
+
+# Raw response text keyed by a hash of everything that determines it, so a
+# retried upload of byte-identical audio skips the model round trip.
+response_cache = ResponseCache(
+    LRUCache(
+        max_entries=config.GEMINI_CACHE_MAX_ENTRIES,
+        max_bytes=config.GEMINI_CACHE_MAX_BYTES,
+        ttl=config.GEMINI_CACHE_TTL,
+    ),
+    SQLiteCache(config.GEMINI_CACHE_DB, ttl=config.GEMINI_CACHE_TTL)
+    if config.GEMINI_CACHE_DB
+    else None,
+)
+
+
+# Identical requests in flight at the same time share one Gemini call
+flights = SingleFlight("gemini")
+thread_flights = ThreadSingleFlight("gemini")
+
+
+def _types():
+    # google.genai.types, imported on first request rather than at startup
+    from google.genai import types
+
+    return types
+
+
+def _cache_key(model, contents, generate_content_config):
+    """
+    Hash of (model, generation config incl. system prompt, every text part and
+    every decoded audio part).
+    """
+    chunks = [model, generate_content_config.model_dump_json(exclude_none=True)]
+    for content in contents:
+        for part in content.parts:
+            if part.inline_data is not None:
+                chunks += [part.inline_data.mime_type, part.inline_data.data]
+            else:
+                chunks += ["text", part.text or ""]
+    return content_hash(*chunks)
+
+
+def _audio_part(audio):
+    # Sniff the real container and shrink PCM to speech grade before upload
+    types = _types()
+    data, mime_type = prepare_audio(audio)
+    return types.Part.from_bytes(mime_type=mime_type, data=data)
+
+
+def _text_request(input_text, sys):
+    types = _types()
     contents = [
         types.Content(
             role="user",
@@ -25,30 +75,16 @@ def generate_with_gemini(input_text, sys):
             types.Part.from_text(text=sys),
         ],
     )
+    return MODEL, contents, generate_content_config
 
-    response = client.models.generate_content(
-        model=model,
-        contents=contents,
-        config=generate_content_config,
-    )
-
-    return json.loads(response.text)
-
-
-def Process_voice_with_Gemini(voice_base64, sys, input_text=""):
-    client = genai.Client(
-        api_key=os.environ.get("GEMINI_API_KEY"),
-    )
 
-    model = "gemini-2.5-flash"
+def _voice_request(voice_base64, sys, input_text=""):
+    types = _types()
     contents = [
         types.Content(
             role="user",
             parts=[
-                types.Part.from_bytes(
-                    mime_type="audio/mpeg",
-                    data=base64.b64decode(voice_base64),
-                ),
+                _audio_part(voice_base64),
                 types.Part.from_text(text=input_text),
             ],
         ),
@@ -60,31 +96,16 @@ def Process_voice_with_Gemini(voice_base64, sys, input_text=""):
             types.Part.from_text(text=sys),
         ],
     )
+    return MODEL, contents, generate_content_config
 
-    response = client.models.generate_content(
-        model=model,
-        contents=contents,
-        config=generate_content_config,
-    )
-
-    return json.loads(response.text)
 
-def transcribe_audio_with_gemini(audio_base64: str) -> str:
-    """
-    Transcribes audio from a base64 encoded string using Gemini.
-    """
-    client = genai.Client(
-        api_key=os.environ.get("GEMINI_API_KEY"),
-    )
-    model = "gemini-2.5-flash" # This model supports audio input
+def _transcription_request(audio_base64):
+    types = _types()
     contents = [
         types.Content(
             role="user",
             parts=[
-                types.Part.from_bytes(
-                    mime_type="audio/mpeg", # Assuming mpeg from previous code
-                    data=base64.b64decode(audio_base64),
-                ),
+                _audio_part(audio_base64),
                 types.Part.from_text(text="Transcribe this audio."), # Instruction for transcription
             ],
         ),
@@ -93,25 +114,16 @@ def transcribe_audio_with_gemini(audio_base64: str) -> str:
         thinking_config=types.ThinkingConfig(), # Removed thinking_budget
         # No specific response_mime_type for plain text, Gemini will just return text
     )
-
-    response = client.models.generate_content(
-        model=model,
-        contents=contents,
-        config=generate_content_config,
-    )
-    return response.text # Direct text response
+    return MODEL, contents, generate_content_config
 
 
-def Process_parts_with_Gemini(data, sys):
-    client = genai.Client(
-        api_key=os.environ.get("GEMINI_API_KEY"),
-    )
+def _parts_request(data, sys):
+    types = _types()
     parts = []
     for item in data:
         parts.append(types.Part.from_text(text=item['text']))
-        parts.append(types.Part.from_bytes(mime_type="audio/mpeg",data=base64.b64decode(item['audio'])))
+        parts.append(_audio_part(item['audio']))
 
-    model = "gemini-2.0-flash"
     contents = [
         types.Content(
             role="user",
@@ -125,14 +137,258 @@ def Process_parts_with_Gemini(data, sys):
             types.Part.from_text(text=sys),
         ],
     )
+    return PARTS_MODEL, contents, generate_content_config
 
-    response = client.models.generate_content(
-        model=model,
-        contents=contents,
-        config=generate_content_config,
+
+def _observe_request(contents):
+    audio_bytes = sum(
+        len(part.inline_data.data)
+        for content in contents
+        for part in content.parts
+        if part.inline_data is not None
     )
+    if audio_bytes:
+        metrics.payload_bytes.observe(audio_bytes, kind="gemini_audio_upload")
+
+
+def _observe_usage(usage):
+    # Token counts reported by Gemini, attributed to the endpoint being served
+    if usage is None:
+        return
+    endpoint = metrics.current_endpoint()
+    output = (usage.candidates_token_count or 0) + (usage.thoughts_token_count or 0)
+    metrics.gemini_tokens.observe(usage.prompt_token_count or 0, endpoint=endpoint, kind="input")
+    metrics.gemini_tokens.observe(output, endpoint=endpoint, kind="output")
+    if usage.cached_content_token_count:
+        metrics.gemini_tokens.observe(
+            usage.cached_content_token_count, endpoint=endpoint, kind="cached"
+        )
+
+
+def _request_key(model, contents, generate_content_config, use_cache):
+    # Shared by the response cache and single-flight; None when neither is on
+    if use_cache or config.SINGLE_FLIGHT_ENABLED:
+        return _cache_key(model, contents, generate_content_config)
+    return None
+
+
+def _cacheable(text, generate_content_config):
+    """
+    Whether a response is worth caching: non-empty and, when JSON was asked
+    for, a complete JSON value. A truncated or malformed reply must not be
+    served back to the retries it causes.
+    """
+    if not text:
+        return False
+    if generate_content_config.response_mime_type == "application/json":
+        try:
+            json.loads(text)
+        except ValueError:
+            return False
+    return True
+
+
+def _call(model, contents, generate_content_config, cache_key=None):
+    client = gemini_client.get_client()
+    _observe_request(contents)
+    with gemini_client.limit(), metrics.upstream("gemini", "generate_content"):
+        response = client.models.generate_content(
+            model=model,
+            contents=contents,
+            config=generate_content_config,
+        )
+    _observe_usage(response.usage_metadata)
+
+    if cache_key is not None and _cacheable(response.text, generate_content_config):
+        response_cache.set(cache_key, response.text)
+    return response.text
+
+
+async def _call_async(model, contents, generate_content_config, cache_key=None):
+    client = gemini_client.get_client()
+    _observe_request(contents)
+    async with gemini_client.alimit():
+        with metrics.upstream("gemini", "generate_content"):
+            response = await client.aio.models.generate_content(
+                model=model,
+                contents=contents,
+                config=generate_content_config,
+            )
+    _observe_usage(response.usage_metadata)
+
+    if cache_key is not None and _cacheable(response.text, generate_content_config):
+        await response_cache.aset(cache_key, response.text)
+    return response.text
+
+
+async def _call_stream_async(model, contents, generate_content_config, cache_key=None):
+    client = gemini_client.get_client()
+    _observe_request(contents)
+    chunks = []
+    usage = None
+    async with gemini_client.alimit():
+        with metrics.upstream("gemini", "generate_content_stream") as timer:
+            stream = await client.aio.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=generate_content_config,
+            )
+            async for chunk in stream:
+                # Cumulative; the last chunk carries the totals
+                usage = chunk.usage_metadata or usage
+                if chunk.text:
+                    chunks.append(chunk.text)
+                    with timer.paused():
+                        yield chunk.text
+    _observe_usage(usage)
+
+    text = "".join(chunks)
+    if cache_key is not None and _cacheable(text, generate_content_config):
+        await response_cache.aset(cache_key, text)
+
+
+def _generate(model, contents, generate_content_config, use_cache=True):
+    use_cache = use_cache and config.GEMINI_CACHE_ENABLED
+    key = _request_key(model, contents, generate_content_config, use_cache)
+    if use_cache:
+        text = response_cache.get(key)
+        if text is not None:
+            return text
+
+    cache_key = key if use_cache else None
+    if config.SINGLE_FLIGHT_ENABLED:
+        return thread_flights.do(
+            key, _call, model, contents, generate_content_config, cache_key
+        )
+    return _call(model, contents, generate_content_config, cache_key)
+
+
+async def _generate_async(model, contents, generate_content_config, use_cache=True):
+    use_cache = use_cache and config.GEMINI_CACHE_ENABLED
+    key = _request_key(model, contents, generate_content_config, use_cache)
+    if use_cache:
+        text = await response_cache.aget(key)
+        if text is not None:
+            return text
+
+    cache_key = key if use_cache else None
+    if config.SINGLE_FLIGHT_ENABLED:
+        return await flights.do(
+            key, _call_async, model, contents, generate_content_config, cache_key
+        )
+    return await _call_async(model, contents, generate_content_config, cache_key)
+
+
+async def _generate_stream_async(model, contents, generate_content_config, use_cache=True):
+    """
+    Yield the response text chunk by chunk as Gemini streams it. A cache hit
+    is yielded as a single chunk; a completed stream is stored in the cache
+    unless it is not valid JSON where JSON was asked for.
+    Identical concurrent streams share one upstream call.
+    """
+    use_cache = use_cache and config.GEMINI_CACHE_ENABLED
+    key = _request_key(model, contents, generate_content_config, use_cache)
+    if use_cache:
+        text = await response_cache.aget(key)
+        if text is not None:
+            yield text
+            return
+
+    cache_key = key if use_cache else None
+    if config.SINGLE_FLIGHT_ENABLED:
+        chunks = flights.stream(
+            key, _call_stream_async, model, contents, generate_content_config, cache_key
+        )
+    else:
+        chunks = _call_stream_async(model, contents, generate_content_config, cache_key)
+    async for chunk in chunks:
+        yield chunk
+
+
+async def stream_json_with_gemini_async(model, contents, generate_content_config, use_cache=True):
+    """
+    Stream a JSON response and yield JSONStreamParser events, i.e. each
+    top-level value and each top-level array element as soon as it is complete.
+    """
+    parser = JSONStreamParser()
+    async for text in _generate_stream_async(
+        model, contents, generate_content_config, use_cache=use_cache
+    ):
+        for event in parser.feed(text):
+            yield event
+    if not parser.done:
+        raise ValueError("Gemini response ended before the JSON object was complete")
+
+
+def generate_with_gemini(input_text, sys, use_cache=True):
+    text = _generate(*_text_request(input_text, sys), use_cache=use_cache)
+    return json.loads(text)
+
+
+async def generate_with_gemini_async(input_text, sys, use_cache=True):
+    text = await _generate_async(*_text_request(input_text, sys), use_cache=use_cache)
+    return json.loads(text)
+
+
+async def stream_questions_with_gemini_async(input_text, sys, use_cache=True):
+    """
+    Yield each string of the ``{"questions": [...]}`` response as soon as
+    Gemini has finished generating it.
+    """
+    async for kind, key, value in stream_json_with_gemini_async(
+        *_text_request(input_text, sys), use_cache=use_cache
+    ):
+        if kind == "item" and key == "questions" and isinstance(value, str):
+            yield value
+
+
+def Process_voice_with_Gemini(voice_base64, sys, input_text="", use_cache=True):
+    text = _generate(*_voice_request(voice_base64, sys, input_text), use_cache=use_cache)
+    return json.loads(text)
+
+
+async def Process_voice_with_Gemini_async(voice_base64, sys, input_text="", use_cache=True):
+    request = await run_blocking(_voice_request, voice_base64, sys, input_text)
+    text = await _generate_async(*request, use_cache=use_cache)
+    return json.loads(text)
+
+
+def transcribe_audio_with_gemini(audio_base64: str, use_cache=True) -> str:
+    """
+    Transcribes audio from a base64 encoded string using Gemini.
+    """
+    return _generate(*_transcription_request(audio_base64), use_cache=use_cache) # Direct text response
+
+
+async def transcribe_audio_with_gemini_async(audio_base64: str, use_cache=True) -> str:
+    """
+    Transcribes audio from a base64 encoded string using Gemini without
+    blocking the event loop.
+    """
+    request = await run_blocking(_transcription_request, audio_base64)
+    return await _generate_async(*request, use_cache=use_cache)
 
-    return json.loads(response.text)
+
+def Process_parts_with_Gemini(data, sys, use_cache=True):
+    text = _generate(*_parts_request(data, sys), use_cache=use_cache)
+    return json.loads(text)
+
+
+async def Process_parts_with_Gemini_async(data, sys, use_cache=True):
+    request = await run_blocking(_parts_request, data, sys)
+    text = await _generate_async(*request, use_cache=use_cache)
+    return json.loads(text)
+
+
+async def stream_parts_with_gemini_async(data, sys, use_cache=True):
+    """
+    Streaming counterpart of Process_parts_with_Gemini_async: yields the
+    JSONStreamParser events of the response, so each top-level value and
+    each element of a top-level array arrives as soon as it is complete.
+    """
+    request = await run_blocking(_parts_request, data, sys)
+    async for event in stream_json_with_gemini_async(*request, use_cache=use_cache):
+        yield event
 
 
 validation_prompt = """User will provide some audio data. we have to convert it into json format. JSON SCHEMA: 
@@ -145,3 +401,39 @@ validation_prompt = """User will provide some audio data. we have to convert it
  
  if the data is not present in the provided audio, return None for that field."""
 
+
+
+validation_with_transcript_prompt = """User will provide some audio data. we have to convert it into json format. JSON SCHEMA: 
+{"age": int (if the age is below 0 or above 120 please return with the following text 'The age does not seem to be valid for a human. please retry again'),
+ "Gender": str (MALE, FEMALE, OTHER),
+ "symptoms": str ,
+ "additional_info": {"field_name": data } (if any additional info is present in the provided audio, return that for this field else return None),
+ "detected_language": str (if the language is not detected return 'This language is not supported yet'),
+ "transcript": str (verbatim transcription of everything said in the audio, in the spoken language),
+ }
+ 
+ if the data is not present in the provided audio, return None for that field."""
+
+
+def validate_and_transcribe_with_gemini(voice_base64, use_cache=True):
+    """
+    Extract the validated patient fields and the verbatim transcript of the
+    same audio in a single model call.
+
+    Returns:
+        tuple: (patient fields dict, transcript str or None)
+    """
+    data = Process_voice_with_Gemini(
+        voice_base64, validation_with_transcript_prompt, use_cache=use_cache
+    )
+    return data, data.pop("transcript", None)
+
+
+async def validate_and_transcribe_with_gemini_async(voice_base64, use_cache=True):
+    """
+    Async variant of validate_and_transcribe_with_gemini.
+    """
+    data = await Process_voice_with_Gemini_async(
+        voice_base64, validation_with_transcript_prompt, use_cache=use_cache
+    )
+    return data, data.pop("transcript", None)
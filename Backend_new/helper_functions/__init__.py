@@ -1,5 +1,57 @@
-from .Gemini_handler import generate_with_gemini, validation_prompt, Process_voice_with_Gemini, Process_parts_with_Gemini
-from .tts import text_to_speech, audio_bytes_to_base64, base64_to_audio_file, text_to_speech_concurrent
+import importlib
+
+# Public helpers, imported from their modules on first access (PEP 562) so
+# that importing the package, or a light submodule such as config, does not
+# pull in the model pipeline. The SDKs themselves load on first use.
+_LAZY_EXPORTS = {
+    "generate_with_gemini": "Gemini_handler",
+    "generate_with_gemini_async": "Gemini_handler",
+    "validation_prompt": "Gemini_handler",
+    "validation_with_transcript_prompt": "Gemini_handler",
+    "Process_voice_with_Gemini": "Gemini_handler",
+    "Process_voice_with_Gemini_async": "Gemini_handler",
+    "Process_parts_with_Gemini": "Gemini_handler",
+    "Process_parts_with_Gemini_async": "Gemini_handler",
+    "transcribe_audio_with_gemini_async": "Gemini_handler",
+    "validate_and_transcribe_with_gemini": "Gemini_handler",
+    "validate_and_transcribe_with_gemini_async": "Gemini_handler",
+    "stream_questions_with_gemini_async": "Gemini_handler",
+    "stream_parts_with_gemini_async": "Gemini_handler",
+    "text_to_speech": "tts",
+    "text_to_speech_async": "tts",
+    "text_to_speech_concurrent": "tts",
+    "text_to_speech_concurrent_async": "tts",
+    "text_to_speech_ordered_async": "tts",
+    "audio_bytes_to_base64": "tts",
+    "base64_to_audio_file": "tts",
+}
+
+
+def __getattr__(name):
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
+
+
+WELCOME_MESSAGE = "Hi Welcome to Medconcious Chat, Please state your patient's Name, Age , Gender and the Symptoms they are experiencing. Share any additional Information that will help the diagnosis"
+AGE_ERROR_MESSAGE = "Age not provided or invalid."
+GENDER_ERROR_MESSAGE = "Please provide patient Gender details."
+SYMPTOMS_ERROR_MESSAGE = "Symptoms not provided or invalid."
+
+# Fixed phrases spoken to the doctor, pre-rendered to audio at startup
+STATIC_PHRASES = [
+    WELCOME_MESSAGE,
+    AGE_ERROR_MESSAGE,
+    GENDER_ERROR_MESSAGE,
+    SYMPTOMS_ERROR_MESSAGE,
+]
 
 QUESTION_GENERATION_PROMPT_B2B = '''
 # Clinical Assessment Question Generator
@@ -74,3 +126,15 @@ Your response must be a single valid JSON object with the following structure:
 This is the details of the patient:
 [[patient_details]]
 """
+
+
+__all__ = [
+    "WELCOME_MESSAGE",
+    "AGE_ERROR_MESSAGE",
+    "GENDER_ERROR_MESSAGE",
+    "SYMPTOMS_ERROR_MESSAGE",
+    "STATIC_PHRASES",
+    "QUESTION_GENERATION_PROMPT_B2B",
+    "DIFFERENTIAL_DIAGONOSIS_GENERATION_PROMPT",
+    *_LAZY_EXPORTS,
+]
@@ -0,0 +1,298 @@
+import base64
+import io
+import struct
+import wave
+
+from . import config, metrics
+
+# numpy, and soundfile which needs it, are imported by the functions that
+# use them, so they load with the first decoded upload instead of at startup
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def decode_audio(audio):
+    """
+    Return raw audio bytes from either a base64 string (JSON endpoints) or
+    bytes already read from a binary upload.
+    """
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        return bytes(audio)
+    return base64.b64decode(audio)
+
+
+def sniff_mime_type(audio_bytes):
+    """
+    Identify the container from its magic bytes.
+
+    Returns:
+        str: MIME type, "audio/mpeg" when the format is not recognised
+    """
+    head = audio_bytes[:12]
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "audio/wav"
+    if head[:4] == b"OggS":
+        return "audio/ogg"
+    if head[:4] == b"fLaC":
+        return "audio/flac"
+    if head[4:8] == b"ftyp":
+        return "audio/mp4"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "audio/webm"
+    if head[:3] == b"ID3":
+        return "audio/mpeg"
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xF6 == 0xF0:
+        # ADTS frame sync with layer bits 00
+        return "audio/aac"
+    return "audio/mpeg"
+
+
+def read_wav(audio_bytes):
+    """
+    Decode a RIFF/WAVE file holding integer or float PCM.
+
+    Returns:
+        tuple: (float32 samples shaped [frames, channels] in [-1, 1], sample rate),
+        or None when the file is not PCM or is malformed
+    """
+    import numpy as np
+
+    fmt = None
+    data = None
+    pos = 12
+    while pos + 8 <= len(audio_bytes):
+        chunk_id = audio_bytes[pos : pos + 4]
+        (size,) = struct.unpack("<I", audio_bytes[pos + 4 : pos + 8])
+        body = audio_bytes[pos + 8 : pos + 8 + size]
+        if chunk_id == b"fmt " and len(body) >= 16:
+            fmt = struct.unpack("<HHIIHH", body[:16])
+            if fmt[0] == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                (sub_format,) = struct.unpack("<H", body[24:26])
+                fmt = (sub_format,) + fmt[1:]
+        elif chunk_id == b"data":
+            # Streaming recorders may leave the size unset; take what is there
+            data = body
+            break
+        pos += 8 + size + (size & 1)
+
+    if fmt is None or data is None:
+        return None
+    audio_format, channels, rate, _, _, bits = fmt
+    width = bits // 8
+    if channels < 1 or width < 1 or rate < 1:
+        return None
+    data = data[: len(data) - len(data) % (width * channels)]
+
+    if audio_format == WAVE_FORMAT_PCM and width == 1:
+        samples = (np.frombuffer(data, np.uint8).astype(np.float32) - 128) / 128
+    elif audio_format == WAVE_FORMAT_PCM and width == 2:
+        samples = np.frombuffer(data, "<i2").astype(np.float32) / 32768
+    elif audio_format == WAVE_FORMAT_PCM and width == 3:
+        raw = np.frombuffer(data, np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 8388608
+    elif audio_format == WAVE_FORMAT_PCM and width == 4:
+        samples = np.frombuffer(data, "<i4").astype(np.float32) / 2147483648
+    elif audio_format == WAVE_FORMAT_IEEE_FLOAT and width in (4, 8):
+        samples = np.frombuffer(data, "<f4" if width == 4 else "<f8").astype(np.float32)
+    else:
+        return None
+    return samples.reshape(-1, channels), rate
+
+
+def to_mono(samples):
+    """
+    Downmix [frames, channels] samples to a 1-D mono signal.
+    """
+    import numpy as np
+
+    if samples.ndim == 1:
+        return samples
+    return samples.mean(axis=1, dtype=np.float32)
+
+
+def resample(samples, source_rate, target_rate):
+    """
+    Band-limited resampling of a mono signal via the FFT: the spectrum is
+    truncated to the target Nyquist frequency, which doubles as the
+    anti-aliasing filter. Only downsamples; lower rates are returned as is.
+    """
+    import numpy as np
+
+    if source_rate <= target_rate or len(samples) == 0:
+        return samples, source_rate
+    out_len = max(1, int(round(len(samples) * target_rate / source_rate)))
+    spectrum = np.fft.rfft(samples)[: out_len // 2 + 1]
+    resampled = np.fft.irfft(spectrum, out_len) * (out_len / len(samples))
+    return resampled.astype(np.float32), target_rate
+
+
+def trim_silence(
+    samples,
+    rate,
+    frame_ms=None,
+    threshold_db=None,
+    dynamic_range_db=None,
+    padding_ms=None,
+    max_pause_ms=None,
+):
+    """
+    Frame-energy voice activity detection on a mono signal.
+
+    A frame counts as speech when its RMS level is above both
+    ``threshold_db`` (dBFS) and the loudest frame minus ``dynamic_range_db``.
+    Speech is padded by ``padding_ms`` on each side. Leading and trailing
+    silence is dropped and internal pauses are shortened to ``max_pause_ms``.
+    Audio with no detected speech is returned untouched. Defaults come from
+    the VAD_* settings.
+
+    Returns:
+        tuple: (trimmed samples, stats dict with original/kept/leading/
+        trailing/pause seconds)
+    """
+    import numpy as np
+
+    frame_ms = frame_ms or config.VAD_FRAME_MS
+    threshold_db = config.VAD_THRESHOLD_DB if threshold_db is None else threshold_db
+    dynamic_range_db = (
+        config.VAD_DYNAMIC_RANGE_DB if dynamic_range_db is None else dynamic_range_db
+    )
+    padding_ms = config.VAD_PADDING_MS if padding_ms is None else padding_ms
+    max_pause_ms = config.VAD_MAX_PAUSE_MS if max_pause_ms is None else max_pause_ms
+
+    frame = max(1, int(rate * frame_ms / 1000))
+    n_frames = -(-len(samples) // frame)
+    stats = {
+        "original_seconds": len(samples) / rate if rate > 0 else 0.0,
+        "kept_seconds": len(samples) / rate if rate > 0 else 0.0,
+        "leading_seconds": 0.0,
+        "trailing_seconds": 0.0,
+        "pause_seconds": 0.0,
+    }
+    if n_frames == 0 or rate <= 0:
+        return samples, stats
+
+    padded = np.zeros(n_frames * frame, dtype=np.float32)
+    padded[: len(samples)] = samples
+    rms = np.sqrt(np.mean(padded.reshape(n_frames, frame) ** 2, axis=1))
+    level_db = 20 * np.log10(rms + 1e-10)
+    voiced = level_db > max(threshold_db, level_db.max() - dynamic_range_db)
+    if not voiced.any():
+        return samples, stats
+
+    pad_frames = int(round(padding_ms / frame_ms))
+    if pad_frames:
+        voiced = np.convolve(voiced, np.ones(2 * pad_frames + 1), mode="same") > 0
+
+    if voiced.all():
+        return samples, stats
+
+    index = np.arange(n_frames)
+    speech = np.flatnonzero(voiced)
+    first, last = speech[0], speech[-1]
+
+    # Position of every silent frame within its run of silence
+    silent = ~voiced
+    run_starts = silent & np.concatenate(([True], voiced[:-1]))
+    run_id = np.cumsum(run_starts)
+    start_index = np.flatnonzero(run_starts)
+    position = index - start_index[np.maximum(run_id - 1, 0)]
+    max_pause_frames = int(round(max_pause_ms / frame_ms))
+    inside = (index >= first) & (index <= last)
+    keep = voiced | (silent & inside & (position < max_pause_frames))
+
+    mask = np.repeat(keep, frame)[: len(samples)]
+    trimmed = samples[mask]
+    frame_seconds = frame / rate
+    stats["kept_seconds"] = len(trimmed) / rate
+    stats["leading_seconds"] = float(first * frame_seconds)
+    stats["trailing_seconds"] = max(0.0, float(len(samples) - (last + 1) * frame) / rate)
+    stats["pause_seconds"] = int((inside & ~keep).sum()) * frame_seconds
+    return trimmed, stats
+
+
+def encode_wav(samples, rate):
+    """
+    Encode a mono float signal as 16-bit PCM WAV.
+    """
+    import numpy as np
+
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def _soundfile():
+    try:
+        import soundfile
+    except ImportError:  # FLAC re-encoding is optional
+        return None
+    return soundfile
+
+
+def encode_flac(samples, rate):
+    buffer = io.BytesIO()
+    _soundfile().write(buffer, samples, rate, format="FLAC", subtype="PCM_16")
+    return buffer.getvalue()
+
+
+def prepare_audio(audio):
+    """
+    Get uploaded audio ready to send to the model.
+
+    The real container is sniffed so the MIME type is correct. PCM WAV is
+    downmixed to mono, resampled to AUDIO_TARGET_SAMPLE_RATE (speech grade)
+    and stripped of silence by trim_silence when VAD_ENABLED. It is then
+    re-encoded as AUDIO_ENCODING ("wav", or "flac" when
+    soundfile is installed). Other containers and undecodable files pass
+    through unchanged.
+
+    Args:
+        audio (str | bytes): Base64 string or raw bytes
+
+    Returns:
+        tuple: (audio bytes, MIME type)
+    """
+    with metrics.stage("audio_prepare"):
+        audio_bytes, mime_type = _prepare_audio(audio)
+    metrics.payload_bytes.observe(len(audio_bytes), kind="audio_prepared")
+    return audio_bytes, mime_type
+
+
+def _prepare_audio(audio):
+    audio_bytes = decode_audio(audio)
+    metrics.payload_bytes.observe(len(audio_bytes), kind="audio_original")
+    mime_type = sniff_mime_type(audio_bytes)
+    if mime_type != "audio/wav" or not config.AUDIO_NORMALIZE:
+        return audio_bytes, mime_type
+
+    decoded = read_wav(audio_bytes)
+    if decoded is None:
+        return audio_bytes, mime_type
+    samples, rate = decoded
+    samples, rate = resample(to_mono(samples), rate, config.AUDIO_TARGET_SAMPLE_RATE)
+    if config.VAD_ENABLED:
+        samples, stats = trim_silence(samples, rate)
+        cut = stats["original_seconds"] - stats["kept_seconds"]
+        if cut > 0:
+            print(
+                f"Trimmed {cut:.2f}s of silence from {stats['original_seconds']:.2f}s "
+                f"of audio (leading {stats['leading_seconds']:.2f}s, trailing "
+                f"{stats['trailing_seconds']:.2f}s, pauses {stats['pause_seconds']:.2f}s)"
+            )
+
+    if config.AUDIO_ENCODING == "flac" and _soundfile() is not None:
+        encoded, encoded_type = encode_flac(samples, rate), "audio/flac"
+    else:
+        encoded, encoded_type = encode_wav(samples, rate), "audio/wav"
+    if len(encoded) >= len(audio_bytes):
+        return audio_bytes, mime_type
+    return encoded, encoded_type
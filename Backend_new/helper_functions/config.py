@@ -0,0 +1,153 @@
+import os
+from dotenv import load_dotenv, find_dotenv
+
+# Load environment variables from .env file before any setting is read
+
+_ = load_dotenv(find_dotenv())
+
+
+def env_int(name, default):
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return int(value)
+
+
+def env_float(name, default):
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return float(value)
+
+
+def env_bool(name, default):
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Gemini client
+GEMINI_MAX_CONCURRENCY = env_int("GEMINI_MAX_CONCURRENCY", 16)
+GEMINI_MAX_CONNECTIONS = env_int("GEMINI_MAX_CONNECTIONS", 32)
+GEMINI_MAX_KEEPALIVE_CONNECTIONS = env_int("GEMINI_MAX_KEEPALIVE_CONNECTIONS", 16)
+GEMINI_KEEPALIVE_EXPIRY = env_float("GEMINI_KEEPALIVE_EXPIRY", 60.0)
+GEMINI_TIMEOUT_MS = env_int("GEMINI_TIMEOUT_MS", 120000)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "")  # empty uses the public endpoint
+GEMINI_MAX_RATE = env_float("GEMINI_MAX_RATE", 20.0)  # calls started per second, 0 = unlimited
+GEMINI_MAX_QUEUE = env_int("GEMINI_MAX_QUEUE", 64)  # waiting calls per priority before 503s
+GEMINI_TARGET_LATENCY = env_float("GEMINI_TARGET_LATENCY", 60.0)  # slower calls lower concurrency, 0 = ignore
+
+# Processes sharing the GEMINI_/TTS_ concurrency and rate budgets; each gets
+# an even share. gunicorn.conf.py sets it to its web and job worker count.
+UPSTREAM_PROCESSES = env_int("UPSTREAM_PROCESSES", 1)
+
+# Import the provider SDKs and create their clients in the background right
+# after startup, instead of on the first request
+PRELOAD_ON_STARTUP = env_bool("PRELOAD_ON_STARTUP", True)
+
+# Per-process connection warmup before /ready reports ready
+WARMUP_CONNECTIONS = env_int("WARMUP_CONNECTIONS", 2)  # per upstream, 0 disables
+WARMUP_TIMEOUT = env_float("WARMUP_TIMEOUT", 10.0)  # seconds per upstream
+
+# Thread pool for blocking work (Supabase SDK, file I/O) off the event loop
+BLOCKING_POOL_SIZE = env_int("BLOCKING_POOL_SIZE", 64)
+
+# OpenAI text-to-speech
+TTS_MAX_CONCURRENCY = env_int("TTS_MAX_CONCURRENCY", 10)  # per request
+TTS_UPSTREAM_MAX_CONCURRENCY = env_int("TTS_UPSTREAM_MAX_CONCURRENCY", 32)  # across UPSTREAM_PROCESSES
+TTS_MAX_RATE = env_float("TTS_MAX_RATE", 20.0)  # calls started per second, 0 = unlimited
+TTS_MAX_QUEUE = env_int("TTS_MAX_QUEUE", 128)  # waiting calls per priority before 503s
+TTS_TARGET_LATENCY = env_float("TTS_TARGET_LATENCY", 10.0)  # slower calls lower concurrency, 0 = ignore
+
+# Validate fields and transcribe the /initialize audio in one Gemini call
+GEMINI_COMBINED_INITIALIZE = env_bool("GEMINI_COMBINED_INITIALIZE", True)
+
+# Share one upstream call between identical concurrent Gemini / TTS requests
+SINGLE_FLIGHT_ENABLED = env_bool("SINGLE_FLIGHT_ENABLED", True)
+
+# Gemini response cache
+GEMINI_CACHE_ENABLED = env_bool("GEMINI_CACHE_ENABLED", True)
+GEMINI_CACHE_MAX_ENTRIES = env_int("GEMINI_CACHE_MAX_ENTRIES", 512)
+GEMINI_CACHE_MAX_BYTES = env_int("GEMINI_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+GEMINI_CACHE_TTL = env_float("GEMINI_CACHE_TTL", 3600.0)
+GEMINI_CACHE_DB = os.getenv("GEMINI_CACHE_DB", "")  # empty disables the disk tier
+
+# Synthesized speech cache
+TTS_CACHE_MAX_BYTES = env_int("TTS_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+TTS_PRERENDER_STATIC = env_bool("TTS_PRERENDER_STATIC", True)
+TTS_BUNDLE_DIR = os.getenv("TTS_BUNDLE_DIR", "")  # pre-rendered static phrases
+
+# Budget for the patient data spliced into prompts; optional fields are
+# trimmed beyond it (estimated at ~4 characters a token, 0 = no limit)
+PATIENT_CONTEXT_MAX_TOKENS = env_int("PATIENT_CONTEXT_MAX_TOKENS", 512)
+
+# Feed questions to TTS while Gemini is still streaming the rest
+PIPELINED_QUESTION_TTS = env_bool("PIPELINED_QUESTION_TTS", True)
+
+# Binary / multipart audio uploads
+MAX_AUDIO_UPLOAD_BYTES = env_int("MAX_AUDIO_UPLOAD_BYTES", 10 * 1024 * 1024)
+MAX_UPLOAD_REQUEST_BYTES = env_int("MAX_UPLOAD_REQUEST_BYTES", 50 * 1024 * 1024)
+MAX_UPLOAD_PARTS = env_int("MAX_UPLOAD_PARTS", 32)
+
+# Audio normalization before model upload
+AUDIO_NORMALIZE = env_bool("AUDIO_NORMALIZE", True)
+AUDIO_TARGET_SAMPLE_RATE = env_int("AUDIO_TARGET_SAMPLE_RATE", 16000)
+AUDIO_ENCODING = os.getenv("AUDIO_ENCODING", "wav")  # wav or flac (needs soundfile)
+
+# Silence trimming (frame-energy voice activity detection)
+VAD_ENABLED = env_bool("VAD_ENABLED", True)
+VAD_FRAME_MS = env_int("VAD_FRAME_MS", 30)
+VAD_THRESHOLD_DB = env_float("VAD_THRESHOLD_DB", -45.0)  # absolute floor, dBFS
+VAD_DYNAMIC_RANGE_DB = env_float("VAD_DYNAMIC_RANGE_DB", 40.0)  # below the loudest frame
+VAD_PADDING_MS = env_int("VAD_PADDING_MS", 200)  # kept around speech
+VAD_MAX_PAUSE_MS = env_int("VAD_MAX_PAUSE_MS", 700)  # longer pauses are shortened to this
+
+# Opt-in debug dumps of request/response payloads, written off the request path
+DEBUG_DUMP_DIR = os.getenv("DEBUG_DUMP_DIR", "")  # empty disables dumping
+DEBUG_DUMP_MAX_PENDING = env_int("DEBUG_DUMP_MAX_PENDING", 32)
+
+# Consultation sessions shared between /initialize and /generate_diagnosis
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")  # memory, sqlite (one host) or redis
+SESSION_TTL = env_float("SESSION_TTL", 2 * 3600.0)
+SESSION_MAX_ENTRIES = env_int("SESSION_MAX_ENTRIES", 10000)
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "sessions.db")
+
+# Write-behind batching of the job workers' database inserts
+DB_WRITE_BATCH_SIZE = env_int("DB_WRITE_BATCH_SIZE", 100)
+DB_WRITE_FLUSH_INTERVAL = env_float("DB_WRITE_FLUSH_INTERVAL", 0.5)  # seconds
+DB_WRITE_MAX_PENDING = env_int("DB_WRITE_MAX_PENDING", 1000)
+
+# Async Supabase (PostgREST) access
+SUPABASE_REST_URL = os.getenv("SUPABASE_REST_URL", "")  # defaults to $SUPABASE_URL/rest/v1
+SUPABASE_POOL_SIZE = env_int("SUPABASE_POOL_SIZE", 20)
+SUPABASE_TIMEOUT = env_float("SUPABASE_TIMEOUT", 10.0)  # seconds per attempt
+SUPABASE_MAX_RETRIES = env_int("SUPABASE_MAX_RETRIES", 3)
+SUPABASE_RETRY_BACKOFF = env_float("SUPABASE_RETRY_BACKOFF", 0.2)  # seconds, doubled per retry
+
+# Durable job queue for background work (transcripts, history/patient rows)
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "jobs.db")
+JOB_WORKER_PROCESSES = env_int("JOB_WORKER_PROCESSES", 1)  # started with the app; 0 = run helper_functions.worker separately
+JOB_WORKER_CONCURRENCY = env_int("JOB_WORKER_CONCURRENCY", 8)  # jobs in flight per worker process
+JOB_MAX_ATTEMPTS = env_int("JOB_MAX_ATTEMPTS", 5)
+JOB_LEASE_SECONDS = env_float("JOB_LEASE_SECONDS", 120.0)  # re-delivered if the worker goes silent this long
+JOB_RETRY_BACKOFF = env_float("JOB_RETRY_BACKOFF", 2.0)  # seconds, doubled per attempt
+JOB_POLL_INTERVAL = env_float("JOB_POLL_INTERVAL", 0.5)  # seconds between claims when idle
+JOB_RETENTION = env_float("JOB_RETENTION", 7 * 24 * 3600.0)  # finished jobs kept this long
+JOB_DEDUPE_WINDOW = env_float("JOB_DEDUPE_WINDOW", 600.0)  # seconds an idempotency key maps to its job
+
+# Asynchronous diagnosis jobs (submit, then poll / long-poll for the result)
+DIAGNOSIS_WORKERS = env_int("DIAGNOSIS_WORKERS", 32)  # diagnoses computed at once per process
+DIAGNOSIS_MAX_QUEUE = env_int("DIAGNOSIS_MAX_QUEUE", 256)  # submissions beyond this get a 503
+DIAGNOSIS_RESULT_TTL = env_float("DIAGNOSIS_RESULT_TTL", 3600.0)  # seconds results stay pollable
+DIAGNOSIS_MAX_RESULTS = env_int("DIAGNOSIS_MAX_RESULTS", 10000)
+DIAGNOSIS_MAX_WAIT = env_float("DIAGNOSIS_MAX_WAIT", 30.0)  # longest long-poll, seconds
+DIAGNOSIS_POLL_INTERVAL = env_float("DIAGNOSIS_POLL_INTERVAL", 0.5)  # long-poll re-check of another worker's job
+
+# Event-loop lag sampling for /metrics, 0 disables
+METRICS_LOOP_LAG_INTERVAL = env_float("METRICS_LOOP_LAG_INTERVAL", 0.1)  # seconds
+
+# Storage backend: supabase (PostgREST) or sqlite (local WAL database)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "medconcious.db")
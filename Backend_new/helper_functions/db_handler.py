@@ -1,6 +1,11 @@
-import supabase
+import asyncio
 import os
+import random
+import httpx
 from dotenv import load_dotenv, find_dotenv
+
+from . import config, metrics
+from .storage import StorageBackend
 # Load environment variables from .env file
 
 _ = load_dotenv(find_dotenv())
@@ -9,6 +14,9 @@ class SupabaseHandler:
     def __init__(self):
         self.url = os.getenv('SUPABASE_URL')
         self.key = os.getenv('SUPABASE_KEY')
+        # Only the legacy sync handler needs the SDK; import it on demand
+        import supabase
+
         self.client = supabase.create_client(self.url, self.key)
     
     def insert_patient_info(self, patient_data):
@@ -43,6 +51,24 @@ class SupabaseHandler:
             print(f"Error fetching conversation history: {e}")
             return None
         
+    def insert_rows(self, table, rows):
+        """
+        Insert several rows into a table with a single bulk request
+        
+        Args:
+            table (str): Table name
+            rows (list): List of row dictionaries
+            
+        Returns:
+            dict: Response from Supabase
+        """
+        try:
+            response = self.client.table(table).insert(rows).execute()
+            return response
+        except Exception as e:
+            print(f"Error inserting {len(rows)} rows into {table}: {e}")
+            return None
+
     def store_user_info(self, user_data):
         """
         Insert user information into user_info table
@@ -77,3 +103,188 @@ class SupabaseHandler:
         except Exception as e:
             print(f"Error fetching user info: {e}")
             return None
+
+
+# Statuses PostgREST/the gateway return before doing any work
+RETRY_STATUSES = {429, 503}
+# Additionally retried for reads, where repeating the request is harmless
+RETRY_STATUSES_IDEMPOTENT = RETRY_STATUSES | {408, 500, 502, 504}
+# Failures where the request never reached the server
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class PostgrestResponse:
+    """
+    Minimal stand-in for the supabase response object: ``data`` holds the
+    decoded rows.
+    """
+
+    def __init__(self, data, status_code):
+        self.data = data
+        self.status_code = status_code
+
+
+class AsyncSupabaseHandler(StorageBackend):
+    """
+    Async counterpart of SupabaseHandler that talks to PostgREST directly
+    over one shared keep-alive connection pool.
+
+    Every method takes an optional per-call ``timeout`` (seconds). Transient
+    failures are retried with jittered exponential backoff. Writes are only
+    retried when the request provably did not run (connection errors,
+    429/503); reads are also retried on timeouts and 5xx.
+
+    Point SUPABASE_REST_URL at any PostgREST-compatible server (e.g. a
+    local stand-in) to run without Supabase; pass ``transport`` to inject an
+    httpx transport in tests.
+    """
+
+    def __init__(self, url=None, key=None, rest_url=None, pool_size=None, timeout=None,
+                 max_retries=None, transport=None):
+        self.url = url or os.getenv('SUPABASE_URL') or ''
+        self.key = key or os.getenv('SUPABASE_KEY') or ''
+        self.rest_url = rest_url or config.SUPABASE_REST_URL or f"{self.url.rstrip('/')}/rest/v1"
+        self.timeout = timeout or config.SUPABASE_TIMEOUT
+        self.max_retries = config.SUPABASE_MAX_RETRIES if max_retries is None else max_retries
+        pool_size = pool_size or config.SUPABASE_POOL_SIZE
+        self.client = httpx.AsyncClient(
+            base_url=self.rest_url,
+            headers={
+                'apikey': self.key,
+                'Authorization': f'Bearer {self.key}',
+                'Content-Type': 'application/json',
+            },
+            limits=httpx.Limits(
+                max_connections=pool_size, max_keepalive_connections=pool_size
+            ),
+            timeout=self.timeout,
+            transport=transport,
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def warm_up(self):
+        # Any response will do; the point is the pooled connection
+        await self.client.head("/")
+
+    async def _request(self, method, path, timeout=None, **kwargs):
+        idempotent = method == 'GET'
+        retry_statuses = RETRY_STATUSES_IDEMPOTENT if idempotent else RETRY_STATUSES
+        retry_errors = RETRY_ERRORS + ((httpx.TimeoutException,) if idempotent else ())
+        attempt = 0
+        while True:
+            try:
+                with metrics.upstream("supabase", f"{method} {path}"):
+                    response = await self.client.request(
+                        method, path, timeout=timeout or self.timeout, **kwargs
+                    )
+                if response.status_code not in retry_statuses or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return PostgrestResponse(
+                        response.json() if response.content else [], response.status_code
+                    )
+            except retry_errors:
+                if attempt >= self.max_retries:
+                    raise
+            # Full jitter: sleep anywhere up to the exponential backoff cap
+            await asyncio.sleep(random.uniform(0, config.SUPABASE_RETRY_BACKOFF * 2 ** attempt))
+            attempt += 1
+
+    async def _insert(self, table, rows, timeout=None):
+        return await self._request(
+            'POST', f'/{table}', timeout=timeout, json=rows,
+            headers={'Prefer': 'return=representation'},
+        )
+
+    async def insert_patient_info(self, patient_data, timeout=None):
+        """
+        Insert patient information into patient_info table
+        
+        Args:
+            patient_data (dict): Dictionary containing patient information
+            timeout (float): Seconds per attempt, defaults to SUPABASE_TIMEOUT
+            
+        Returns:
+            PostgrestResponse: Inserted rows, or None on failure
+        """
+        try:
+            return await self._insert('patient_info', patient_data, timeout)
+        except Exception as e:
+            print(f"Error inserting patient data: {e}")
+            return None
+
+    async def conversation_history(self, conversation_history, timeout=None):
+        """
+        Insert conversation history for a specific patient
+        
+        Args:
+            conversation_history (dict): Row with email and conversation_history
+            timeout (float): Seconds per attempt, defaults to SUPABASE_TIMEOUT
+            
+        Returns:
+            PostgrestResponse: Inserted rows, or None on failure
+        """
+        try:
+            return await self._insert('conversation_history', conversation_history, timeout)
+        except Exception as e:
+            print(f"Error inserting conversation history: {e}")
+            return None
+
+    async def insert_rows(self, table, rows, timeout=None):
+        """
+        Insert several rows into a table with a single bulk request
+        
+        Args:
+            table (str): Table name
+            rows (list): List of row dictionaries
+            timeout (float): Seconds per attempt, defaults to SUPABASE_TIMEOUT
+            
+        Returns:
+            PostgrestResponse: Inserted rows, or None on failure
+        """
+        try:
+            return await self._insert(table, rows, timeout)
+        except Exception as e:
+            print(f"Error inserting {len(rows)} rows into {table}: {e}")
+            return None
+
+    async def store_user_info(self, user_data, timeout=None):
+        """
+        Insert user information into user_info table
+        
+        Args:
+            user_data (dict): Dictionary containing user information
+            timeout (float): Seconds per attempt, defaults to SUPABASE_TIMEOUT
+            
+        Returns:
+            PostgrestResponse: Inserted rows, or None on failure
+        """
+        try:
+            return await self._insert('user_info', user_data, timeout)
+        except Exception as e:
+            print(f"Error inserting user data: {e}")
+            return None
+
+    async def get_user_info(self, user_id, timeout=None):
+        """
+        Fetch user information by user ID
+        
+        Args:
+            user_id (str): Unique identifier for the user
+            timeout (float): Seconds per attempt, defaults to SUPABASE_TIMEOUT
+            
+        Returns:
+            dict: User information if found, else None
+        """
+        try:
+            response = await self._request(
+                'GET', '/user_info', timeout=timeout,
+                params={'select': '*', 'id': f'eq.{user_id}'},
+            )
+            if response.data:
+                return response.data[0]
+            return None
+        except Exception as e:
+            print(f"Error fetching user info: {e}")
+            return None
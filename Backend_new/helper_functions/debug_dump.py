@@ -0,0 +1,62 @@
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime
+
+import aiofiles
+
+from . import config
+from .executor import run_blocking
+
+_pending = set()
+
+
+def enabled():
+    return bool(config.DEBUG_DUMP_DIR)
+
+
+def new_request_id():
+    return uuid.uuid4().hex
+
+
+def dump(request_id, name, data):
+    """
+    Schedule ``data`` to be written to DEBUG_DUMP_DIR without waiting for it.
+
+    Dicts/lists are written as JSON, bytes as-is. Each request gets its own
+    files (``<timestamp>-<request_id>-<name>``), so concurrent requests never
+    share a path. Does nothing unless DEBUG_DUMP_DIR is set; drops the dump
+    when DEBUG_DUMP_MAX_PENDING writes are already queued.
+    """
+    if not enabled():
+        return
+    if len(_pending) >= config.DEBUG_DUMP_MAX_PENDING:
+        print(f"Debug dump backlog full, dropping {name} for {request_id}.")
+        return
+    timestamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(config.DEBUG_DUMP_DIR, f"{timestamp}-{request_id}-{name}")
+    task = asyncio.create_task(_write(path, data))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+async def _write(path, data):
+    try:
+        if not isinstance(data, (bytes, bytearray)):
+            data = await run_blocking(
+                lambda: json.dumps(data, indent=4, default=str).encode("utf-8")
+            )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        async with aiofiles.open(path, "wb") as dump_file:
+            await dump_file.write(data)
+    except Exception as e:
+        print(f"Error writing debug dump {path}: {e}")
+
+
+async def drain():
+    """
+    Wait for queued dumps to finish, e.g. on shutdown.
+    """
+    if _pending:
+        await asyncio.gather(*list(_pending), return_exceptions=True)
@@ -0,0 +1,54 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config
+
+# Bounded pool for calls that have no async API. Sized by BLOCKING_POOL_SIZE
+# so one worker can keep many consultations in flight without spawning an
+# unbounded number of threads. Created on first use so that a shutdown
+# (end of an app lifespan) can be followed by a fresh start.
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=config.BLOCKING_POOL_SIZE,
+                    thread_name_prefix="blocking",
+                )
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking callable on the shared pool and await its result. It
+    runs in a copy of the caller's context, so context variables (upstream
+    priority, the endpoint metrics label) carry over to the thread.
+
+    Args:
+        func (callable): Function to call
+        *args, **kwargs: Arguments passed through to ``func``
+
+    Returns:
+        Whatever ``func`` returns
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
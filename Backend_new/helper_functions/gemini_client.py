@@ -0,0 +1,107 @@
+import os
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+from . import config
+from .governor import Governor
+
+_client = None
+_client_lock = threading.Lock()
+
+# Adaptive bound on Gemini calls in flight and started per second from this
+# process, shared by blocking calls from threads and awaited calls.
+governor = Governor(
+    "gemini",
+    max_concurrency=config.GEMINI_MAX_CONCURRENCY,
+    max_rate=config.GEMINI_MAX_RATE,
+    max_queue=config.GEMINI_MAX_QUEUE,
+    target_latency=config.GEMINI_TARGET_LATENCY,
+    processes=config.UPSTREAM_PROCESSES,
+)
+
+
+def _http_options():
+    import httpx
+    from google.genai import types
+
+    limits = httpx.Limits(
+        max_connections=config.GEMINI_MAX_CONNECTIONS,
+        max_keepalive_connections=config.GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.GEMINI_KEEPALIVE_EXPIRY,
+    )
+    return types.HttpOptions(
+        base_url=config.GEMINI_BASE_URL or None,
+        timeout=config.GEMINI_TIMEOUT_MS,
+        client_args={"limits": limits},
+        async_client_args={"limits": limits},
+    )
+
+
+def get_client():
+    """
+    Return the process-wide Gemini client, creating it on first use.
+
+    The client owns one keep-alive connection pool for sync calls and one for
+    async calls (``client.aio``), so repeated requests reuse open connections
+    instead of paying a new TLS handshake each time.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # The SDK is imported here, not at module import, to keep
+                # cold starts fast
+                from google import genai
+
+                _client = genai.Client(
+                    api_key=os.environ.get("GEMINI_API_KEY"),
+                    http_options=_http_options(),
+                )
+    return _client
+
+
+def close_client():
+    """
+    Close the shared client's sync connection pool and forget the client.
+    """
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
+
+
+async def aclose_client():
+    """
+    Close both connection pools of the shared client and forget the client.
+    """
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        await client.aio.aclose()
+        client.close()
+
+
+@contextmanager
+def limit():
+    """
+    Wait for the governor to admit a blocking call and report its outcome.
+
+    Raises:
+        Overloaded: when too many calls are already waiting
+    """
+    with governor.slot():
+        yield
+
+
+@asynccontextmanager
+async def alimit():
+    """
+    Wait for the governor to admit an awaited call and report its outcome.
+
+    Raises:
+        Overloaded: when too many calls are already waiting
+    """
+    async with governor.aslot():
+        yield
@@ -0,0 +1,323 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from . import metrics
+
+# Priority of upstream calls, lower is served first
+CONTINUING = 0  # a consultation already under way (questions, diagnosis)
+NEW = 1  # the first call of a new consultation
+BACKGROUND = 2  # job workers, startup pre-rendering
+
+PRIORITY_NAMES = {CONTINUING: "continuing", NEW: "new", BACKGROUND: "background"}
+
+_priority = contextvars.ContextVar("upstream_priority", default=NEW)
+
+
+def set_priority(level):
+    """
+    Set the priority of upstream calls made from the current task, and from
+    tasks it starts afterwards, for the rest of its life.
+    """
+    _priority.set(level)
+
+
+@contextmanager
+def priority(level):
+    """
+    Scoped ``set_priority``. Must not span a ``yield`` of a generator.
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class Overloaded(Exception):
+    """
+    Raised instead of queueing an upstream call when too many calls of the
+    same or higher priority are already waiting.
+
+    Attributes:
+        upstream (str): Governor name
+        retry_after (int): Suggested seconds before retrying
+    """
+
+    def __init__(self, upstream, retry_after):
+        super().__init__(f"{upstream} is overloaded, retry after {retry_after}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+def is_rate_limited(error):
+    """
+    Whether ``error`` is an HTTP 429 from the Gemini or OpenAI SDK (or httpx).
+    """
+    if 429 in (getattr(error, "status_code", None), getattr(error, "code", None)):
+        return True
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 429
+
+
+class _Waiter:
+    __slots__ = ("level", "seq", "loop", "event")
+
+    def __init__(self, level, seq, loop):
+        self.level = level
+        self.seq = seq
+        self.loop = loop
+        self.event = asyncio.Event() if loop is not None else threading.Event()
+
+    def __lt__(self, other):
+        return (self.level, self.seq) < (other.level, other.seq)
+
+    def wake(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.event.set)
+        else:
+            self.event.set()
+
+
+class Governor:
+    """
+    Process-wide admission control for one upstream API, shared by async
+    callers and blocking calls made from threads.
+
+    A call needs a concurrency slot and a token from a token bucket. Both
+    limits adapt (AIMD): every call that succeeds within ``target_latency``
+    raises them a little, up to ``max_concurrency`` / ``max_rate``; a 429
+    halves them and a slow call trims concurrency by 10%, at most once per
+    typical call duration, so a burst of 429s counts as one signal.
+
+    Callers that cannot start at once wait in a priority queue (see
+    ``set_priority``). When ``max_queue`` calls of the same or higher
+    priority are already waiting, the call is refused with Overloaded
+    instead, so a backlog becomes fast 503s rather than timeouts.
+
+    Args:
+        name (str): Upstream label in /metrics
+        max_concurrency (int): Ceiling for calls in flight
+        max_rate (float): Ceiling for calls started per second, 0 for none
+        max_queue (int): Waiting calls of a priority before shedding
+        target_latency (float): Seconds above which a call counts as slow,
+            0 to ignore latency
+        processes (int): Processes sharing ``max_concurrency`` and
+            ``max_rate``; this one takes an even share of each
+    """
+
+    def __init__(
+        self, name, max_concurrency, max_rate, max_queue, target_latency=0.0, processes=1
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency // processes)
+        self.max_rate = max_rate / processes
+        self.max_queue = max_queue
+        self.target_latency = target_latency
+        self.limit = float(self.max_concurrency)
+        self.rate = float(self.max_rate)
+        self.tokens = self._burst()
+        self.in_flight = 0
+        self._refilled = time.monotonic()
+        self._backoff_until = 0.0
+        self._avg_latency = None
+        self._waiters = []  # heap of _Waiter
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._publish()
+
+    def _burst(self):
+        # At most one second's worth of calls may start back to back
+        return max(1.0, self.rate)
+
+    def _refill(self, now):
+        if self.max_rate:
+            self.tokens = min(self._burst(), self.tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _take(self):
+        # Caller holds the lock
+        if self.in_flight >= max(1, int(self.limit)):
+            return False
+        if self.max_rate:
+            self._refill(time.monotonic())
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+        self.in_flight += 1
+        return True
+
+    def _token_delay(self):
+        # Caller holds the lock
+        if not self.max_rate or self.tokens >= 1:
+            return None
+        return (1 - self.tokens) / self.rate
+
+    def _retry_after(self, waiting):
+        per_call = self._avg_latency or 1.0
+        throughput = max(1, int(self.limit)) / per_call
+        if self.max_rate:
+            throughput = min(throughput, self.rate)
+        return max(1, math.ceil(waiting / throughput))
+
+    def _enter(self, loop):
+        level = _priority.get()
+        with self._lock:
+            if not self._waiters and self._take():
+                self._publish()
+                return None
+            ahead = sum(1 for waiter in self._waiters if waiter.level <= level)
+            if ahead >= self.max_queue:
+                metrics.upstream_shed.inc(
+                    upstream=self.name, priority=PRIORITY_NAMES.get(level, level)
+                )
+                raise Overloaded(self.name, self._retry_after(ahead))
+            waiter = _Waiter(level, next(self._seq), loop)
+            heapq.heappush(self._waiters, waiter)
+            self._publish()
+            return waiter
+
+    def _poll(self, waiter):
+        """
+        Admit ``waiter`` if it is first in line and capacity allows.
+
+        Returns:
+            tuple: (admitted, seconds to wait for a token or None)
+        """
+        with self._lock:
+            if self._waiters[0] is not waiter:
+                return False, None
+            if not self._take():
+                return False, self._token_delay()
+            heapq.heappop(self._waiters)
+            following = self._waiters[0] if self._waiters else None
+            self._publish()
+        # Capacity may allow the next caller in line to start as well
+        if following is not None:
+            following.wake()
+        return True, None
+
+    def _abandon(self, waiter):
+        with self._lock:
+            was_first = self._waiters[0] is waiter
+            self._waiters.remove(waiter)
+            heapq.heapify(self._waiters)
+            following = self._waiters[0] if was_first and self._waiters else None
+            self._publish()
+        if following is not None:
+            following.wake()
+
+    def _leave(self, seconds, error):
+        with self._lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if error is not None and is_rate_limited(error):
+                metrics.upstream_throttled.inc(upstream=self.name)
+                if now >= self._backoff_until:
+                    self.limit = max(1.0, self.limit / 2)
+                    if self.max_rate:
+                        self._refill(now)
+                        self.rate = max(self.max_rate / 20, self.rate / 2)
+                        self.tokens = min(self.tokens, self._burst())
+                    self._backoff_until = now + (self._avg_latency or 1.0)
+            elif error is None:
+                self._avg_latency = (
+                    seconds if self._avg_latency is None
+                    else 0.9 * self._avg_latency + 0.1 * seconds
+                )
+                if self.target_latency and seconds > self.target_latency:
+                    if now >= self._backoff_until:
+                        self.limit = max(1.0, self.limit * 0.9)
+                        self._backoff_until = now + self._avg_latency
+                else:
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                    if self.max_rate:
+                        self._refill(now)
+                        self.rate = min(self.max_rate, self.rate + self.max_rate / 50)
+            first = self._waiters[0] if self._waiters else None
+            self._publish()
+        if first is not None:
+            first.wake()
+
+    def _publish(self):
+        # Caller holds the lock
+        metrics.upstream_limit.set(self.limit, upstream=self.name, limit="concurrency")
+        metrics.upstream_limit.set(self.rate, upstream=self.name, limit="rate")
+        metrics.upstream_queued.set(len(self._waiters), upstream=self.name)
+
+    @asynccontextmanager
+    async def aslot(self):
+        """
+        Hold one call's worth of capacity while awaiting an upstream call.
+
+        Raises:
+            Overloaded: when the queue for this call's priority is full
+        """
+        waiter = self._enter(asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                while True:
+                    waiter.event.clear()
+                    admitted, delay = self._poll(waiter)
+                    if admitted:
+                        break
+                    try:
+                        await asyncio.wait_for(waiter.event.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                self._abandon(waiter)
+                raise
+
+        started = time.monotonic()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._leave(time.monotonic() - started, error)
+
+    @contextmanager
+    def slot(self):
+        """
+        Blocking counterpart of ``aslot`` for calls made from threads.
+        """
+        waiter = self._enter(None)
+        if waiter is not None:
+            try:
+                while True:
+                    waiter.event.clear()
+                    admitted, delay = self._poll(waiter)
+                    if admitted:
+                        break
+                    waiter.event.wait(delay)
+            except BaseException:
+                self._abandon(waiter)
+                raise
+
+        started = time.monotonic()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._leave(time.monotonic() - started, error)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "concurrency_limit": round(self.limit, 2),
+                "rate_limit": round(self.rate, 2),
+                "in_flight": self.in_flight,
+                "queued": len(self._waiters),
+                "avg_latency": self._avg_latency,
+            }
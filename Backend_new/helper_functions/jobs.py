@@ -0,0 +1,287 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from . import config
+from .executor import run_blocking
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class Job:
+    """
+    A claimed job as seen by a worker. ``progress`` holds whatever earlier
+    attempts checkpointed, so a retried handler can skip steps that already
+    happened.
+    """
+
+    def __init__(self, queue, owner, row):
+        self.queue = queue
+        self.owner = owner
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.payload = json.loads(row["payload"])
+        self.attachment = row["attachment"]
+        self.progress = json.loads(row["progress"] or "{}")
+        self.attempts = row["attempts"]
+        self.max_attempts = row["max_attempts"]
+
+    async def checkpoint(self, **progress):
+        """
+        Durably record finished steps for this job.
+        """
+        self.progress.update(progress)
+        await self.queue.checkpoint(self.id, self.owner, self.progress)
+
+
+class JobQueue:
+    """
+    Durable job queue in a SQLite database (WAL), shared by the app and any
+    number of worker processes.
+
+    Delivery is at-least-once: a claimed job is leased to one worker for
+    JOB_LEASE_SECONDS, extended by heartbeats while it runs. A job whose
+    worker died is claimed again once the lease lapses. Failed attempts are
+    retried with exponential backoff up to ``max_attempts``. Jobs enqueued
+    with the same idempotency key within JOB_DEDUPE_WINDOW of each other map
+    to a single job; after that the key starts a new one.
+
+    Args:
+        path (str): Database file, defaults to JOB_QUEUE_PATH
+    """
+
+    def __init__(self, path=None):
+        self.path = path or config.JOB_QUEUE_PATH
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, idempotency_key TEXT UNIQUE, "
+            "payload TEXT NOT NULL, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL, "
+            "run_at REAL NOT NULL, lease_owner TEXT, lease_until REAL, "
+            "progress TEXT, result TEXT, error TEXT, attachment BLOB, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_at)")
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=10.0, isolation_level=None, check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _enqueue(self, kind, payload, idempotency_key, max_attempts, attachment):
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if idempotency_key is not None:
+                # A key only deduplicates retries; an older job gives it up
+                conn.execute(
+                    "UPDATE jobs SET idempotency_key = NULL "
+                    "WHERE idempotency_key = ? AND created_at < ?",
+                    (idempotency_key, now - config.JOB_DEDUPE_WINDOW),
+                )
+            conn.execute(
+                "INSERT INTO jobs (id, kind, idempotency_key, payload, attachment, status, "
+                "max_attempts, run_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (idempotency_key) DO NOTHING",
+                (
+                    job_id, kind, idempotency_key, json.dumps(payload), attachment, QUEUED,
+                    max_attempts or config.JOB_MAX_ATTEMPTS, now, now, now,
+                ),
+            )
+            if idempotency_key is not None:
+                job_id = conn.execute(
+                    "SELECT id FROM jobs WHERE idempotency_key = ?", (idempotency_key,)
+                ).fetchone()["id"]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def _claim(self, owner, kinds):
+        now = time.time()
+        marks = ", ".join("?" for _ in kinds)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Leases that lapsed on the last allowed attempt are not retried
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = 'Lease expired', lease_owner = NULL, "
+                "updated_at = ? WHERE status = ? AND lease_until < ? AND attempts >= max_attempts",
+                (FAILED, now, RUNNING, now),
+            )
+            row = conn.execute(
+                f"SELECT id FROM jobs WHERE kind IN ({marks}) AND ("
+                "(status = ? AND run_at <= ?) OR (status = ? AND lease_until < ?)) "
+                "ORDER BY run_at LIMIT 1",
+                (*kinds, QUEUED, now, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            row = conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, "
+                "lease_until = ?, updated_at = ? WHERE id = ? RETURNING *",
+                (RUNNING, owner, now + config.JOB_LEASE_SECONDS, now, row["id"]),
+            ).fetchone()
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return Job(self, owner, row)
+
+    def _update_owned(self, job_id, owner, assignments, values):
+        # Only the current lease holder may change a running job
+        cursor = self._connection().execute(
+            f"UPDATE jobs SET {assignments}, updated_at = ? "
+            "WHERE id = ? AND lease_owner = ? AND status = ?",
+            (*values, time.time(), job_id, owner, RUNNING),
+        )
+        return cursor.rowcount == 1
+
+    def _heartbeat(self, job_id, owner):
+        return self._update_owned(
+            job_id, owner, "lease_until = ?", (time.time() + config.JOB_LEASE_SECONDS,)
+        )
+
+    def _checkpoint(self, job_id, owner, progress):
+        return self._update_owned(job_id, owner, "progress = ?", (json.dumps(progress),))
+
+    # Finished jobs are kept for status polls, their attachment is not
+    def _complete(self, job_id, owner, result):
+        return self._update_owned(
+            job_id, owner,
+            "status = ?, result = ?, error = NULL, lease_owner = NULL, attachment = NULL",
+            (SUCCEEDED, json.dumps(result)),
+        )
+
+    def _fail(self, job_id, owner, error, attempts, max_attempts):
+        if attempts >= max_attempts:
+            return self._update_owned(
+                job_id, owner, "status = ?, error = ?, lease_owner = NULL, attachment = NULL",
+                (FAILED, error),
+            )
+        # Full jitter on an exponential backoff
+        delay = random.uniform(0, config.JOB_RETRY_BACKOFF * 2 ** (attempts - 1))
+        return self._update_owned(
+            job_id, owner, "status = ?, error = ?, run_at = ?, lease_owner = NULL",
+            (QUEUED, error, time.time() + delay),
+        )
+
+    def _get(self, job_id):
+        row = self._connection().execute(
+            "SELECT id, kind, status, attempts, max_attempts, progress, result, error, "
+            "created_at, updated_at FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for field in ("progress", "result"):
+            job[field] = json.loads(job[field]) if job[field] else None
+        return job
+
+    def _counts(self):
+        rows = self._connection().execute(
+            "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+        ).fetchall()
+        counts = dict.fromkeys((QUEUED, RUNNING, SUCCEEDED, FAILED), 0)
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def _purge(self, older_than):
+        cursor = self._connection().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (SUCCEEDED, FAILED, time.time() - older_than),
+        )
+        return cursor.rowcount
+
+    async def enqueue(
+        self, kind, payload, idempotency_key=None, max_attempts=None, attachment=None
+    ):
+        """
+        Persist a job and return its id. Enqueuing again with the same
+        ``idempotency_key`` within JOB_DEDUPE_WINDOW returns the existing
+        job's id.
+
+        Args:
+            kind (str): Handler name
+            payload (dict): JSON-serializable job arguments
+            idempotency_key (str): Optional deduplication key
+            max_attempts (int): Defaults to JOB_MAX_ATTEMPTS
+            attachment (bytes): Optional binary input, stored as a BLOB next
+                to the payload and dropped once the job has finished
+
+        Returns:
+            str: Job id
+        """
+        return await run_blocking(
+            self._enqueue, kind, payload, idempotency_key, max_attempts, attachment
+        )
+
+    async def claim(self, owner, kinds):
+        """
+        Lease the next runnable job of one of ``kinds`` to ``owner``.
+
+        Returns:
+            Job: The claimed job, or None when nothing is runnable
+        """
+        return await run_blocking(self._claim, owner, tuple(kinds))
+
+    async def heartbeat(self, job_id, owner):
+        return await run_blocking(self._heartbeat, job_id, owner)
+
+    async def checkpoint(self, job_id, owner, progress):
+        return await run_blocking(self._checkpoint, job_id, owner, progress)
+
+    async def complete(self, job_id, owner, result=None):
+        return await run_blocking(self._complete, job_id, owner, result)
+
+    async def fail(self, job, error):
+        return await run_blocking(
+            self._fail, job.id, job.owner, error, job.attempts, job.max_attempts
+        )
+
+    async def get(self, job_id):
+        """
+        Job status without its payload, or None for an unknown id.
+        """
+        return await run_blocking(self._get, job_id)
+
+    async def counts(self):
+        return await run_blocking(self._counts)
+
+    async def purge(self, older_than=None):
+        """
+        Delete finished jobs last updated more than ``older_than`` seconds ago.
+        """
+        return await run_blocking(self._purge, older_than or config.JOB_RETENTION)
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
@@ -0,0 +1,132 @@
+import json
+
+
+class JSONStreamParser:
+    """
+    Incremental parser for a streamed top-level JSON object.
+
+    Feed it text chunks as they arrive; it reports each top-level value once
+    it is syntactically complete, and each element of a top-level array as
+    soon as that element is complete, without waiting for the rest of the
+    document. Anything before the opening ``{`` (e.g. a code fence) is ignored.
+
+    Events returned by ``feed``:
+        ("value", key, value): a complete top-level non-array value
+        ("item", key, value): a complete element of the top-level array ``key``
+    """
+
+    def __init__(self):
+        self.done = False
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._reading_key = False
+        self._string_start = None
+        self._phase = None  # key, colon, value, in_value, after_array
+        self._key = None
+        self._value_start = None
+        self._in_array = False
+        self._item_start = None
+
+    def feed(self, chunk):
+        """
+        Consume ``chunk`` and return the list of events it completed.
+        """
+        events = []
+        self._buf += chunk
+        buf = self._buf
+        i = self._pos
+        while i < len(buf) and not self.done:
+            c = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._reading_key:
+                        self._reading_key = False
+                        self._key = json.loads(buf[self._string_start : i + 1])
+                        self._phase = "colon"
+            elif c in " \t\r\n":
+                pass
+            elif self._depth == 0:
+                if c == "{":
+                    self._depth = 1
+                    self._phase = "key"
+            elif self._depth == 1:
+                self._top_level(c, i, events)
+            else:
+                self._nested(c, i, events)
+            i += 1
+        self._pos = i
+        return events
+
+    def _top_level(self, c, i, events):
+        if self._phase == "key":
+            if c == '"':
+                self._in_string = True
+                self._reading_key = True
+                self._string_start = i
+            elif c == "}":
+                self.done = True
+        elif self._phase == "colon":
+            if c == ":":
+                self._phase = "value"
+        elif self._phase == "value":
+            if c == "[":
+                self._depth = 2
+                self._in_array = True
+                self._item_start = None
+            else:
+                self._value_start = i
+                self._phase = "in_value"
+                if c == "{":
+                    self._depth = 2
+                elif c == '"':
+                    self._in_string = True
+        elif self._phase == "in_value":
+            if c in ",}":
+                value = json.loads(self._buf[self._value_start : i])
+                events.append(("value", self._key, value))
+                self._value_start = None
+                self._end_member(c)
+        elif self._phase == "after_array":
+            self._end_member(c)
+
+    def _end_member(self, c):
+        if c == ",":
+            self._phase = "key"
+        elif c == "}":
+            self.done = True
+
+    def _nested(self, c, i, events):
+        element_level = self._in_array and self._depth == 2
+        if c in "{[":
+            if element_level and self._item_start is None:
+                self._item_start = i
+            self._depth += 1
+        elif c in "}]":
+            self._depth -= 1
+            if self._depth == 1 and self._in_array:
+                # Closing bracket of the top-level array
+                self._emit_item(i, events)
+                self._in_array = False
+                self._phase = "after_array"
+        elif c == "," and element_level:
+            self._emit_item(i, events)
+        else:
+            if element_level and self._item_start is None:
+                self._item_start = i
+            if c == '"':
+                self._in_string = True
+
+    def _emit_item(self, end, events):
+        if self._item_start is None:
+            return
+        value = json.loads(self._buf[self._item_start : end])
+        events.append(("item", self._key, value))
+        self._item_start = None
@@ -0,0 +1,380 @@
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+BYTE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+_registry = []
+
+# Raised into work its caller abandoned (client gone, timeout), not failures
+CANCELLED = (GeneratorExit, asyncio.CancelledError)
+
+# ASGI scope of the request being served, set by MetricsMiddleware
+_scope = contextvars.ContextVar("http_scope", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines += self._render_sample(key, value)
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts, _, _ = state
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_sample(self, key, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render():
+    """
+    All registered metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in _registry:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# Request handling
+http_requests = Counter(
+    "medconcious_http_requests_total", "HTTP requests by route and status.",
+    ("method", "route", "status"),
+)
+http_request_seconds = Histogram(
+    "medconcious_http_request_seconds", "HTTP request latency by route.",
+    ("method", "route"),
+)
+http_in_flight = Gauge(
+    "medconcious_http_requests_in_flight", "HTTP requests currently being served.",
+)
+
+# Pipeline stages inside a request or background task
+stage_seconds = Histogram(
+    "medconcious_stage_seconds", "Latency of each processing stage.", ("stage",),
+)
+stage_errors = Counter(
+    "medconcious_stage_errors_total", "Processing stages that raised.", ("stage",),
+)
+stage_cancelled = Counter(
+    "medconcious_stage_cancelled_total", "Processing stages abandoned by their caller.",
+    ("stage",),
+)
+
+# Calls to Gemini, OpenAI and the database
+upstream_seconds = Histogram(
+    "medconcious_upstream_seconds", "Latency of upstream calls.", ("upstream", "operation"),
+)
+upstream_in_flight = Gauge(
+    "medconcious_upstream_in_flight", "Upstream calls currently in flight.", ("upstream",),
+)
+upstream_errors = Counter(
+    "medconcious_upstream_errors_total", "Failed upstream calls by exception type.",
+    ("upstream", "operation", "error"),
+)
+upstream_cancelled = Counter(
+    "medconcious_upstream_cancelled_total", "Upstream calls abandoned by their caller.",
+    ("upstream", "operation"),
+)
+
+# Adaptive admission control in front of Gemini and OpenAI
+upstream_limit = Gauge(
+    "medconcious_upstream_limit", "Current adaptive concurrency and rate (per second) limits.",
+    ("upstream", "limit"),
+)
+upstream_queued = Gauge(
+    "medconcious_upstream_queued", "Calls waiting for upstream capacity.", ("upstream",),
+)
+upstream_throttled = Counter(
+    "medconcious_upstream_throttled_total", "Upstream calls answered with 429.", ("upstream",),
+)
+upstream_shed = Counter(
+    "medconcious_upstream_shed_total", "Calls refused because too many were already waiting.",
+    ("upstream", "priority"),
+)
+
+# Identical concurrent calls that joined one already in flight
+singleflight_shared = Counter(
+    "medconcious_singleflight_shared_total", "Calls coalesced into an identical in-flight call.",
+    ("flight",),
+)
+
+# Gemini token usage from response usage metadata
+gemini_tokens = Histogram(
+    "medconcious_gemini_tokens", "Tokens per Gemini call by endpoint (input, output, cached).",
+    ("endpoint", "kind"), buckets=TOKEN_BUCKETS,
+)
+prompt_trimmed = Counter(
+    "medconcious_prompt_trimmed_total", "Optional prompt fields trimmed to fit the token budget.",
+    ("field",),
+)
+
+# Payload sizes
+payload_bytes = Histogram(
+    "medconcious_payload_bytes", "Size of payloads sent or received.", ("kind",),
+    buckets=BYTE_BUCKETS,
+)
+
+# Event loop responsiveness
+event_loop_lag = Histogram(
+    "medconcious_event_loop_lag_seconds", "Delay of a timer callback past its deadline.",
+    buckets=LAG_BUCKETS,
+)
+
+# Caches and queues, refreshed when /metrics is scraped
+cache_events = Gauge(
+    "medconcious_cache_events", "Cache lookups by result since start.", ("cache", "result"),
+)
+cache_bytes = Gauge("medconcious_cache_bytes", "Bytes held by each cache.", ("cache",))
+jobs = Gauge("medconcious_jobs", "Durable queue jobs by status.", ("status",))
+diagnosis_jobs = Gauge(
+    "medconcious_diagnosis_jobs", "Asynchronous diagnosis jobs queued or running.", ("status",),
+)
+
+
+class Timer:
+    """
+    Time since creation, minus the time spent inside ``paused()``.
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._paused = 0.0
+
+    @contextmanager
+    def paused(self):
+        """
+        Leave a block out of the measurement, e.g. a ``yield`` to the
+        consumer of a stream, whose pace is not ours.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._paused += time.perf_counter() - start
+
+    def elapsed(self):
+        return time.perf_counter() - self._start - self._paused
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a processing stage and count it as an error if it raises. Yields a
+    Timer; generators wrap their ``yield`` in ``timer.paused()``. A stage
+    abandoned by its caller is counted as cancelled and not timed.
+    """
+    timer = Timer()
+    try:
+        yield timer
+    except CANCELLED:
+        stage_cancelled.inc(stage=name)
+        raise
+    except BaseException:
+        stage_errors.inc(stage=name)
+        stage_seconds.observe(timer.elapsed(), stage=name)
+        raise
+    stage_seconds.observe(timer.elapsed(), stage=name)
+
+
+@contextmanager
+def upstream(name, operation):
+    """
+    Track one upstream call: in-flight gauge, latency and error count. Like
+    ``stage``, yields a Timer and counts abandoned calls as cancelled.
+    """
+    upstream_in_flight.inc(upstream=name)
+    timer = Timer()
+    try:
+        yield timer
+    except CANCELLED:
+        upstream_cancelled.inc(upstream=name, operation=operation)
+        raise
+    except BaseException as e:
+        upstream_errors.inc(upstream=name, operation=operation, error=type(e).__name__)
+        upstream_seconds.observe(timer.elapsed(), upstream=name, operation=operation)
+        raise
+    else:
+        upstream_seconds.observe(timer.elapsed(), upstream=name, operation=operation)
+    finally:
+        upstream_in_flight.dec(upstream=name)
+
+
+async def monitor_event_loop(interval):
+    """
+    Sample event-loop lag forever: sleep ``interval`` and record how late the
+    wake-up was. Anything blocking the loop shows up as lag.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(0.0, loop.time() - start - interval))
+
+
+def current_endpoint():
+    """
+    Route template of the request being served, or "background" outside one.
+    """
+    scope = _scope.get()
+    if scope is None:
+        return "background"
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request count, latency (until the last body
+    chunk, so streamed responses are timed in full) and in-flight requests.
+    Requests are labelled by route template, not raw path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        _scope.set(scope)
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec()
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            http_requests.inc(method=method, route=route, status=status)
+            http_request_seconds.observe(
+                time.perf_counter() - start, method=method, route=route
+            )
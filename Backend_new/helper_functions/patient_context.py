@@ -0,0 +1,81 @@
+import json
+
+from . import config, metrics
+
+# Dropped, largest parts first, when the context is over budget
+OPTIONAL_FIELDS = ("additional_info",)
+
+
+def compact_json(value):
+    """
+    Canonical JSON: sorted keys, no insignificant whitespace, non-ASCII kept
+    as is. Equal data always gives the same text, and the same prompt.
+    """
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def estimate_tokens(text):
+    # Rough rule of thumb for Gemini tokenizers, about four characters a token
+    return (len(text) + 3) // 4
+
+
+def _prune(value):
+    # Nulls and empty containers carry nothing for the model
+    if isinstance(value, dict):
+        pruned = {key: _prune(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if item not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [item for item in map(_prune, value) if item not in (None, "", [], {})]
+    return value
+
+
+def _shrink(value):
+    """
+    A smaller version of ``value``, or None once nothing useful is left.
+    """
+    if isinstance(value, dict) and len(value) > 1:
+        largest = max(value, key=lambda key: len(compact_json(value[key])))
+        return {key: item for key, item in value.items() if key != largest}
+    if isinstance(value, list) and len(value) > 1:
+        return value[:-1]
+    if isinstance(value, str) and len(value) > 64:
+        return value[: len(value) // 2].rstrip() + "..."
+    return None
+
+
+def patient_context(data, max_tokens=None):
+    """
+    Serialize patient data for a prompt as compact canonical JSON.
+
+    Null and empty fields are left out. When the estimated size exceeds
+    ``max_tokens`` (PATIENT_CONTEXT_MAX_TOKENS by default, 0 for no limit),
+    OPTIONAL_FIELDS are shrunk and then dropped until it fits; required
+    fields are never trimmed.
+
+    Args:
+        data (dict): Patient data as returned by validation
+        max_tokens (int): Budget for the serialized context
+
+    Returns:
+        str: JSON text for the prompt
+    """
+    if max_tokens is None:
+        max_tokens = config.PATIENT_CONTEXT_MAX_TOKENS
+    data = _prune(data)
+    text = compact_json(data)
+    if not max_tokens or not isinstance(data, dict) or estimate_tokens(text) <= max_tokens:
+        return text
+
+    for field in OPTIONAL_FIELDS:
+        while field in data and estimate_tokens(text) > max_tokens:
+            metrics.prompt_trimmed.inc(field=field)
+            smaller = _shrink(data[field])
+            if smaller is None:
+                del data[field]
+            else:
+                data[field] = smaller
+            text = compact_json(data)
+
+    if estimate_tokens(text) > max_tokens:
+        print(f"Patient context is ~{estimate_tokens(text)} tokens after trimming, over {max_tokens}.")
+    return text
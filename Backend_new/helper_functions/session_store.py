@@ -0,0 +1,192 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from . import config
+from .cache import LRUCache
+from .executor import run_blocking
+
+
+def new_consultation_id():
+    return uuid.uuid4().hex
+
+
+class SessionStore:
+    """
+    Interface for consultation state shared between /initialize and
+    /generate_diagnosis. A session is a JSON-serializable dict holding the
+    validated ``user_data``, the ``questions`` asked and other artifacts of
+    the consultation such as the initial ``transcript``.
+    """
+
+    async def get(self, consultation_id):
+        raise NotImplementedError
+
+    async def set(self, consultation_id, session):
+        raise NotImplementedError
+
+    async def delete(self, consultation_id):
+        raise NotImplementedError
+
+    async def update(self, consultation_id, **fields):
+        """
+        Merge ``fields`` into an existing session.
+
+        Returns:
+            dict: Updated session, or None if it does not exist (any more)
+        """
+        session = await self.get(consultation_id)
+        if session is None:
+            return None
+        session.update(fields)
+        await self.set(consultation_id, session)
+        return session
+
+    async def close(self):
+        pass
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Per-process LRU with TTL. Only correct with a single worker process.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, prefix=""):
+        self._sessions = LRUCache(
+            max_entries=max_entries or config.SESSION_MAX_ENTRIES,
+            ttl=ttl or config.SESSION_TTL,
+        )
+        self._prefix = prefix
+
+    async def get(self, consultation_id):
+        session = self._sessions.get(self._prefix + consultation_id)
+        return dict(session) if session is not None else None
+
+    async def set(self, consultation_id, session):
+        self._sessions.set(self._prefix + consultation_id, dict(session))
+
+    async def delete(self, consultation_id):
+        self._sessions.pop(self._prefix + consultation_id)
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions in Redis so every worker and replica sees the same consultation.
+    Requires the optional ``redis`` package.
+    """
+
+    def __init__(self, url=None, ttl=None, prefix="consultation:"):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url or config.SESSION_REDIS_URL)
+        self._ttl = int(ttl or config.SESSION_TTL)
+        self._prefix = prefix
+
+    async def get(self, consultation_id):
+        value = await self._redis.get(self._prefix + consultation_id)
+        return json.loads(value) if value is not None else None
+
+    async def set(self, consultation_id, session):
+        await self._redis.set(
+            self._prefix + consultation_id, json.dumps(session), ex=self._ttl
+        )
+
+    async def delete(self, consultation_id):
+        await self._redis.delete(self._prefix + consultation_id)
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a local SQLite database (WAL), shared by every worker
+    process on the host, so pre-fork serving works without Redis.
+    """
+
+    def __init__(self, path=None, ttl=None, prefix=""):
+        self.path = path or config.SESSION_SQLITE_PATH
+        self._ttl = ttl or config.SESSION_TTL
+        self._prefix = prefix
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._writes = 0
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, session TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (expires_at)")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path, timeout=10.0, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _get(self, consultation_id):
+        row = self._connection().execute(
+            "SELECT session FROM sessions WHERE id = ? AND expires_at > ?",
+            (self._prefix + consultation_id, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def _set(self, consultation_id, session):
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (id, session, expires_at) VALUES (?, ?, ?)",
+            (self._prefix + consultation_id, json.dumps(session), now + self._ttl),
+        )
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+
+    def _delete(self, consultation_id):
+        self._connection().execute(
+            "DELETE FROM sessions WHERE id = ?", (self._prefix + consultation_id,)
+        )
+
+    async def get(self, consultation_id):
+        return await run_blocking(self._get, consultation_id)
+
+    async def set(self, consultation_id, session):
+        await run_blocking(self._set, consultation_id, session)
+
+    async def delete(self, consultation_id):
+        await run_blocking(self._delete, consultation_id)
+
+    async def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+
+SESSION_BACKENDS = {
+    "memory": InMemorySessionStore,
+    "redis": RedisSessionStore,
+    "sqlite": SQLiteSessionStore,
+}
+
+
+def create_session_store(backend=None, **options):
+    """
+    Build the session store selected by SESSION_BACKEND. ``options`` (e.g.
+    ``ttl``, ``prefix``) go to its constructor, so the same backend can hold
+    other short-lived shared state under its own key prefix.
+    """
+    backend = backend or config.SESSION_BACKEND
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(f"Unknown SESSION_BACKEND {backend!r}")
+    return SESSION_BACKENDS[backend](**options)
@@ -0,0 +1,168 @@
+import asyncio
+import threading
+
+from . import metrics
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent async calls. The first caller for a key
+    starts the work as its own task; callers arriving while it is in flight
+    await the same task instead of starting another. Unlike a cache, nothing
+    is kept once the call finishes.
+
+    The shared task is shielded from any single caller being cancelled and is
+    only cancelled when every caller waiting on it has gone away.
+
+    Args:
+        name (str): Label for the coalesced-call counter in /metrics
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}  # key -> [task, waiters]
+        self._streams = {}  # key -> [task, readers, broadcast]
+
+    def __len__(self):
+        return len(self._flights) + len(self._streams)
+
+    async def do(self, key, func, *args, **kwargs):
+        """
+        Return ``await func(*args, **kwargs)``, sharing one call per ``key``.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            flight = self._flights[key] = [task, 0]
+            task.add_done_callback(lambda _: self._forget(self._flights, key, flight))
+        else:
+            metrics.singleflight_shared.inc(flight=self.name)
+
+        flight[1] += 1
+        try:
+            return await asyncio.shield(flight[0])
+        except asyncio.CancelledError:
+            if flight[0].cancelled() or flight[0].done():
+                raise
+            flight[1] -= 1
+            if flight[1] == 0:
+                self._forget(self._flights, key, flight)
+                flight[0].cancel()
+            raise
+
+    async def stream(self, key, func, *args, **kwargs):
+        """
+        Async-generator counterpart of ``do``: ``func(*args, **kwargs)`` must
+        return an async iterator. One iteration runs per key and every
+        caller receives all of its items from the start, including items
+        produced before it joined.
+        """
+        flight = self._streams.get(key)
+        if flight is None:
+            broadcast = _Broadcast()
+            task = asyncio.ensure_future(broadcast.pump(func(*args, **kwargs)))
+            flight = self._streams[key] = [task, 0, broadcast]
+            task.add_done_callback(lambda _: self._forget(self._streams, key, flight))
+        else:
+            metrics.singleflight_shared.inc(flight=self.name)
+
+        flight[1] += 1
+        try:
+            async for item in flight[2].subscribe():
+                yield item
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0 and not flight[2].done:
+                self._forget(self._streams, key, flight)
+                flight[0].cancel()
+
+    @staticmethod
+    def _forget(flights, key, flight):
+        if flights.get(key) is flight:
+            del flights[key]
+
+
+class _Broadcast:
+    """
+    Buffer of items from one async iterator, replayed to any number of readers.
+    """
+
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Condition()
+
+    async def pump(self, iterator):
+        try:
+            async for item in iterator:
+                async with self._changed:
+                    self.items.append(item)
+                    self._changed.notify_all()
+        except BaseException as e:
+            self.error = e
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            self.done = True
+            async with self._changed:
+                self._changed.notify_all()
+
+    async def subscribe(self):
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: position < len(self.items) or self.done)
+                items = self.items[position:]
+                finished = self.done
+            position += len(items)
+            for item in items:
+                yield item
+            if finished:
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class ThreadSingleFlight:
+    """
+    Blocking counterpart of SingleFlight for code that runs in worker threads:
+    the first thread for a key does the work, the others wait for its result
+    (or exception).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights = {}  # key -> _Call
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._flights.get(key)
+            leader = call is None
+            if leader:
+                call = self._flights[key] = _Call()
+        if not leader:
+            metrics.singleflight_shared.inc(flight=self.name)
+            call.finished.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            call.finished.set()
+
+
+class _Call:
+    def __init__(self):
+        self.finished = threading.Event()
+        self.result = None
+        self.error = None
@@ -0,0 +1,158 @@
+import json
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from . import config, metrics
+from .executor import run_blocking
+
+
+class StorageBackend:
+    """
+    Async interface shared by every storage engine. Write methods return an
+    object whose ``data`` holds the stored rows, or None on failure;
+    get_user_info returns the row or None.
+    """
+
+    async def insert_patient_info(self, patient_data, timeout=None):
+        return await self.insert_rows('patient_info', patient_data, timeout)
+
+    async def conversation_history(self, conversation_history, timeout=None):
+        return await self.insert_rows('conversation_history', conversation_history, timeout)
+
+    async def store_user_info(self, user_data, timeout=None):
+        return await self.insert_rows('user_info', user_data, timeout)
+
+    async def insert_rows(self, table, rows, timeout=None):
+        raise NotImplementedError
+
+    async def get_user_info(self, user_id, timeout=None):
+        raise NotImplementedError
+
+    async def warm_up(self):
+        """
+        Open a connection ahead of the first real query, if the backend has any.
+        """
+
+    async def aclose(self):
+        pass
+
+
+class StorageResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Local storage in a single SQLite database in WAL mode, for on-prem
+    deployments and hermetic load tests.
+
+    Each table keeps ``id``, ``email`` and ``created_at`` as indexed columns
+    and the full row as JSON, so rows of any shape round-trip unchanged.
+    Queries run on the blocking pool with one connection per thread.
+    """
+
+    TABLES = ('patient_info', 'conversation_history', 'user_info')
+
+    def __init__(self, path=None):
+        self.path = path or config.SQLITE_PATH
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        conn = self._connection()
+        for table in self.TABLES:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "id TEXT PRIMARY KEY, email TEXT, created_at TEXT NOT NULL, data TEXT NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_email ON {table} (email)")
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _insert_rows(self, table, rows):
+        if table not in self.TABLES:
+            raise ValueError(f"Unknown table {table!r}")
+        if isinstance(rows, dict):
+            rows = [rows]
+        created_at = datetime.now(timezone.utc).isoformat()
+        stored = []
+        for row in rows:
+            row = dict(row)
+            row.setdefault('id', uuid.uuid4().hex)
+            row.setdefault('created_at', created_at)
+            stored.append(row)
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO {table} (id, email, created_at, data) VALUES (?, ?, ?, ?)",
+                [
+                    (str(row['id']), row.get('email'), row['created_at'], json.dumps(row, default=str))
+                    for row in stored
+                ],
+            )
+        return StorageResponse(stored)
+
+    def _get_user_info(self, user_id):
+        row = self._connection().execute(
+            "SELECT data FROM user_info WHERE id = ?", (str(user_id),)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def insert_rows(self, table, rows, timeout=None):
+        """
+        Insert one row (dict) or several rows (list) into a table
+        
+        Args:
+            table (str): Table name
+            rows (dict | list): Row dictionary or list of row dictionaries
+            timeout (float): Unused, kept for interface compatibility
+            
+        Returns:
+            StorageResponse: Stored rows including generated ids, or None on failure
+        """
+        try:
+            with metrics.upstream("sqlite", f"insert {table}"):
+                return await run_blocking(self._insert_rows, table, rows)
+        except Exception as e:
+            print(f"Error inserting rows into {table}: {e}")
+            return None
+
+    async def get_user_info(self, user_id, timeout=None):
+        try:
+            with metrics.upstream("sqlite", "select user_info"):
+                return await run_blocking(self._get_user_info, user_id)
+        except Exception as e:
+            print(f"Error fetching user info: {e}")
+            return None
+
+    async def aclose(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+
+def create_storage(backend=None):
+    """
+    Build the storage engine selected by STORAGE_BACKEND.
+    """
+    backend = backend or config.STORAGE_BACKEND
+    if backend == 'sqlite':
+        return SQLiteStorage()
+    if backend == 'supabase':
+        from .db_handler import AsyncSupabaseHandler
+
+        return AsyncSupabaseHandler()
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}")
@@ -0,0 +1,21 @@
+import json
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def ndjson_event(data):
+    """
+    Encode one event as a line of newline-delimited JSON.
+    """
+    return json.dumps(data, separators=(",", ":")) + "\n"
+
+
+def sse_event(data, event=None):
+    """
+    Encode one Server-Sent Event whose data field is ``data`` as JSON.
+    """
+    message = ""
+    if event:
+        message += f"event: {event}\n"
+    return message + f"data: {json.dumps(data, separators=(',', ':'))}\n\n"
@@ -0,0 +1,216 @@
+import asyncio
+import contextvars
+import math
+import time
+import uuid
+
+from .cache import LRUCache
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class PoolFull(Exception):
+    """
+    Raised by TaskPool.submit when the queue is at capacity.
+
+    Attributes:
+        retry_after (int): Suggested seconds before resubmitting
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(f"Queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class _Entry:
+    def __init__(self, job_id):
+        self.job = {
+            "job_id": job_id,
+            "status": QUEUED,
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        self.done = asyncio.Event()
+
+
+class TaskPool:
+    """
+    Bounded in-process pool for long async calls whose results clients poll
+    for instead of holding a connection open.
+
+    ``workers`` tasks drain a queue of at most ``max_queue`` pending jobs;
+    submissions beyond that are refused with PoolFull so overload turns into
+    quick 503s rather than ever-growing latency. Job state and results are
+    kept in memory for ``ttl`` seconds. Jobs always run in the process that
+    accepted them; when started with a shared ``store`` (a SessionStore),
+    every state change is also published there, so any worker process can
+    answer polls for any job.
+
+    Args:
+        workers (int): Jobs run concurrently
+        max_queue (int): Jobs waiting to start
+        ttl (float): Seconds a job's state and result are kept
+        max_entries (int): Upper bound on jobs remembered at once
+        poll_interval (float): Seconds between store reads while
+            long-polling a job run by another process
+    """
+
+    def __init__(self, workers, max_queue, ttl, max_entries, poll_interval=0.5):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.poll_interval = poll_interval
+        self._jobs = LRUCache(max_entries=max_entries, ttl=ttl, sizeof=lambda _: 1)
+        self._store = None
+        self._queue = None
+        self._tasks = []
+        self._running = 0
+        self._avg_seconds = None
+
+    def start(self, store=None):
+        self._store = store
+        self._queue = asyncio.Queue(self.max_queue)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def close(self):
+        """
+        Stop the workers. Running jobs are abandoned and queued ones never
+        start; both end up failed.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while not self._queue.empty():
+            entry = self._queue.get_nowait()[0]
+            await self._finish(entry, FAILED, error="Server shut down")
+
+    async def submit(self, func, *args, **kwargs):
+        """
+        Queue ``await func(*args, **kwargs)`` and return its job id at once.
+        The call runs in a copy of the caller's context, so request-scoped
+        context variables (metrics endpoint, upstream priority) carry over.
+
+        Raises:
+            PoolFull: when ``max_queue`` jobs are already waiting
+        """
+        if self._queue.full():
+            raise PoolFull(self.retry_after())
+        entry = _Entry(uuid.uuid4().hex)
+        self._jobs.set(entry.job["job_id"], entry)
+        # Published before it can start, so it never overwrites a later state
+        await self._publish(entry)
+        try:
+            self._queue.put_nowait((entry, func, args, kwargs, contextvars.copy_context()))
+        except asyncio.QueueFull:
+            # Filled up by other submissions while publishing
+            await self._finish(entry, FAILED, error="Queue full")
+            raise PoolFull(self.retry_after()) from None
+        return entry.job["job_id"]
+
+    async def get(self, job_id):
+        """
+        Snapshot of a job's state, or None when unknown or expired.
+        """
+        entry = self._jobs.get(job_id)
+        if entry is not None:
+            return dict(entry.job)
+        if self._store is None:
+            return None
+        return await self._store.get(job_id)
+
+    async def wait(self, job_id, timeout):
+        """
+        Long-poll: like ``get`` but first waits up to ``timeout`` seconds for
+        the job to finish.
+
+        Raises:
+            ValueError: when ``timeout`` is NaN or infinite
+        """
+        if not math.isfinite(timeout):
+            raise ValueError(f"timeout must be finite, got {timeout!r}")
+        entry = self._jobs.get(job_id)
+        if entry is not None:
+            if timeout > 0 and not entry.done.is_set():
+                try:
+                    await asyncio.wait_for(entry.done.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            return dict(entry.job)
+        if self._store is None:
+            return None
+
+        # Run by another process: re-read the shared state until it is done
+        deadline = time.monotonic() + timeout
+        job = await self._store.get(job_id)
+        while job is not None and job["status"] in (QUEUED, RUNNING):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(self.poll_interval, remaining))
+            job = await self._store.get(job_id)
+        return job
+
+    def retry_after(self):
+        """
+        Rough seconds until a queue slot frees up, from the average job time.
+        """
+        average = self._avg_seconds or 1.0
+        waiting = self._queue.qsize() if self._queue is not None else 0
+        return max(1, round(average * (waiting / self.workers + 1)))
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._running,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "remembered": len(self._jobs),
+            "avg_seconds": self._avg_seconds,
+        }
+
+    async def _publish(self, entry):
+        if self._store is None:
+            return
+        try:
+            await self._store.set(entry.job["job_id"], entry.job)
+        except Exception as e:
+            print(f"Could not publish the state of job {entry.job['job_id']}: {e!r}")
+
+    async def _finish(self, entry, status, result=None, error=None):
+        entry.job.update(status=status, result=result, error=error, finished_at=time.time())
+        entry.done.set()
+        await self._publish(entry)
+
+    async def _work(self):
+        while True:
+            entry, func, args, kwargs, context = await self._queue.get()
+            job = entry.job
+            job["status"] = RUNNING
+            job["started_at"] = time.time()
+            self._running += 1
+            try:
+                await self._publish(entry)
+                result = await asyncio.create_task(func(*args, **kwargs), context=context)
+            except asyncio.CancelledError:
+                await self._finish(entry, FAILED, error="Server shut down")
+                raise
+            except Exception as e:
+                print(f"Job {job['job_id']} failed: {e!r}")
+                await self._finish(entry, FAILED, error=str(e) or type(e).__name__)
+            else:
+                await self._finish(entry, SUCCEEDED, result=result)
+            finally:
+                self._running -= 1
+                seconds = time.time() - job["started_at"]
+                # Exponentially weighted, so the estimate follows current load
+                self._avg_seconds = (
+                    seconds if self._avg_seconds is None
+                    else 0.8 * self._avg_seconds + 0.2 * seconds
+                )
+                self._queue.task_done()
@@ -1,30 +1,223 @@
+import asyncio
 import base64
-from openai import OpenAI
+import os
+import sys
+import threading
 from concurrent.futures import ThreadPoolExecutor
 import functools
 
+from . import config, metrics
+from .audio import decode_audio
+from .cache import LRUCache, content_hash
+from .governor import Governor
+from .singleflight import SingleFlight, ThreadSingleFlight
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+# Base64 audio keyed by (text, voice, model, format), bounded by total size
+speech_cache = LRUCache(max_bytes=config.TTS_CACHE_MAX_BYTES)
+
+# Identical texts being synthesized at the same time share one request
+flights = SingleFlight("tts")
+thread_flights = ThreadSingleFlight("tts")
+
+# Adaptive bound on speech requests across all requests of this process
+governor = Governor(
+    "openai",
+    max_concurrency=config.TTS_UPSTREAM_MAX_CONCURRENCY,
+    max_rate=config.TTS_MAX_RATE,
+    max_queue=config.TTS_MAX_QUEUE,
+    target_latency=config.TTS_TARGET_LATENCY,
+    processes=config.UPSTREAM_PROCESSES,
+)
+
+# Fixed phrases rendered at startup or loaded from a bundle; never evicted
+_static_audio = {}
+
+
+def _get_client():
+    # Imported on first use so the SDK stays out of the startup path
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+
+                _client = OpenAI()
+    return _client
+
+
+def _get_async_client():
+    # One AsyncOpenAI client per process so TTS calls share a connection pool
+    global _async_client
+    if _async_client is None:
+        # Also created on the blocking pool by the startup warmup
+        with _client_lock:
+            if _async_client is None:
+                from openai import AsyncOpenAI
+
+                _async_client = AsyncOpenAI()
+    return _async_client
+
+
+async def aclose_client():
+    global _client, _async_client
+    client, _client = _client, None
+    if client is not None:
+        client.close()
+    client, _async_client = _async_client, None
+    if client is not None:
+        await client.close()
+
+
 def audio_bytes_to_base64(audio_bytes):
     return base64.b64encode(audio_bytes).decode("utf-8")
 
 
-def text_to_speech(text, voice="shimmer", model="tts-1", language=None):
-    client = OpenAI()
+def speech_key(text, voice="shimmer", model="tts-1", response_format="mp3"):
+    return content_hash(text, voice, model, response_format)
 
-    response = client.audio.speech.create(
-        model=model,
-        voice=voice,
-        input=text
-    )
-    
-    return audio_bytes_to_base64(response.content)
+
+def _cached_speech(key):
+    audio = _static_audio.get(key)
+    if audio is None:
+        audio = speech_cache.get(key)
+    return audio
+
+
+def text_to_speech(text, voice="shimmer", model="tts-1", language=None, response_format="mp3"):
+    key = speech_key(text, voice, model, response_format)
+    audio = _cached_speech(key)
+    if audio is not None:
+        return audio
+    if config.SINGLE_FLIGHT_ENABLED:
+        return thread_flights.do(key, _synthesize, key, text, voice, model, response_format)
+    return _synthesize(key, text, voice, model, response_format)
+
+
+def _synthesize(key, text, voice, model, response_format):
+    client = _get_client()
+
+    with governor.slot(), metrics.upstream("openai", "speech"):
+        response = client.audio.speech.create(
+            model=model,
+            voice=voice,
+            input=text,
+            response_format=response_format,
+        )
+    metrics.payload_bytes.observe(len(response.content), kind="tts_audio")
+
+    audio = audio_bytes_to_base64(response.content)
+    speech_cache.set(key, audio)
+    return audio
+
+
+async def text_to_speech_async(text, voice="shimmer", model="tts-1", language=None, response_format="mp3"):
+    key = speech_key(text, voice, model, response_format)
+    audio = _cached_speech(key)
+    if audio is not None:
+        return audio
+    if config.SINGLE_FLIGHT_ENABLED:
+        return await flights.do(key, _synthesize_async, key, text, voice, model, response_format)
+    return await _synthesize_async(key, text, voice, model, response_format)
+
+
+async def _synthesize_async(key, text, voice, model, response_format):
+    client = _get_async_client()
+
+    async with governor.aslot():
+        with metrics.upstream("openai", "speech"):
+            response = await client.audio.speech.create(
+                model=model,
+                voice=voice,
+                input=text,
+                response_format=response_format,
+            )
+    metrics.payload_bytes.observe(len(response.content), kind="tts_audio")
+
+    audio = audio_bytes_to_base64(response.content)
+    speech_cache.set(key, audio)
+    return audio
+
+
+def load_static_bundle(bundle_dir, texts, voice="shimmer", model="tts-1", response_format="mp3"):
+    """
+    Load pre-rendered audio for ``texts`` from ``bundle_dir``.
+
+    Files are named ``<speech_key>.<response_format>``, as written by
+    build_static_bundle.
+
+    Returns:
+        list: Texts that had no file in the bundle
+    """
+    missing = []
+    for text in texts:
+        key = speech_key(text, voice, model, response_format)
+        path = os.path.join(bundle_dir, f"{key}.{response_format}")
+        if not os.path.exists(path):
+            missing.append(text)
+            continue
+        with open(path, "rb") as audio_file:
+            _static_audio[key] = audio_bytes_to_base64(audio_file.read())
+    return missing
+
+
+async def prerender_static_prompts(texts, voice="shimmer", model="tts-1", response_format="mp3"):
+    """
+    Make the fixed phrases in ``texts`` answerable without a TTS round trip.
+
+    Phrases already loaded (e.g. by the pre-fork master) are skipped.
+    Phrases found in TTS_BUNDLE_DIR are loaded from disk; the rest are
+    synthesized once, concurrently. Failures are reported and skipped so a
+    TTS outage never blocks startup.
+    """
+    texts = [
+        text for text in texts
+        if speech_key(text, voice, model, response_format) not in _static_audio
+    ]
+    if not texts:
+        return
+    missing = list(texts)
+    if config.TTS_BUNDLE_DIR:
+        missing = load_static_bundle(
+            config.TTS_BUNDLE_DIR, texts, voice, model, response_format
+        )
+
+    async def render(text):
+        try:
+            audio = await text_to_speech_async(
+                text, voice=voice, model=model, response_format=response_format
+            )
+            _static_audio[speech_key(text, voice, model, response_format)] = audio
+        except Exception as e:
+            print(f"Error pre-rendering static prompt {text!r}: {e}")
+
+    await asyncio.gather(*(render(text) for text in missing))
+    print(f"Static prompts ready: {len(texts) - len(missing)} from bundle, {len(missing)} rendered.")
+
+
+def build_static_bundle(bundle_dir, texts, voice="shimmer", model="tts-1", response_format="mp3"):
+    """
+    Synthesize ``texts`` and write them to ``bundle_dir`` for load_static_bundle.
+    """
+    os.makedirs(bundle_dir, exist_ok=True)
+    for text in texts:
+        key = speech_key(text, voice, model, response_format)
+        with open(os.path.join(bundle_dir, f"{key}.{response_format}"), "wb") as audio_file:
+            audio_file.write(base64.b64decode(
+                text_to_speech(text, voice=voice, model=model, response_format=response_format)
+            ))
+        print(f"Rendered {text!r} -> {key}.{response_format}")
 
 def base64_to_audio_file(base64_string, filename):
-    audio_bytes = base64.b64decode(base64_string)
+    audio_bytes = decode_audio(base64_string)
     with open(filename, "wb") as audio_file:
         audio_file.write(audio_bytes)
 
 def text_to_speech_concurrent(list_of_texts, language = "English"):
-    with ThreadPoolExecutor(max_workers=10) as executor:
+    with ThreadPoolExecutor(max_workers=config.TTS_MAX_CONCURRENCY) as executor:
         # Create partial function with language parameter
         tts_func = functools.partial(text_to_speech, language=language)
         
@@ -42,3 +235,80 @@ def text_to_speech_concurrent(list_of_texts, language = "English"):
     
     return {"data": data}
 
+
+async def text_to_speech_concurrent_async(list_of_texts, language="English"):
+    slots = asyncio.Semaphore(config.TTS_MAX_CONCURRENCY)
+
+    async def tts_func(text):
+        async with slots:
+            return await text_to_speech_async(text, language=language)
+
+    audio_results = await asyncio.gather(*(tts_func(text) for text in list_of_texts))
+
+    print("Audio generation completed for all texts.")
+
+    data = []
+    for i, text in enumerate(list_of_texts):
+        data.append({
+            "text": text,
+            "audio": audio_results[i]
+        })
+
+    return {"data": data}
+
+
+async def _aiter_list(items):
+    for item in items:
+        yield item
+
+
+async def text_to_speech_ordered_async(texts, language="English"):
+    """
+    Synthesize ``texts`` concurrently and yield ``(index, {"text", "audio"})``
+    in input order, each as soon as it and every earlier item are ready.
+
+    ``texts`` may be a list or an async iterable; with the latter, synthesis
+    of each text starts the moment it arrives, overlapping with whatever is
+    still producing the rest.
+    """
+    if not hasattr(texts, "__aiter__"):
+        texts = _aiter_list(texts)
+    slots = asyncio.Semaphore(config.TTS_MAX_CONCURRENCY)
+    queue = asyncio.Queue()
+    tasks = []
+
+    async def tts_func(text):
+        async with slots:
+            return await text_to_speech_async(text, language=language)
+
+    async def produce():
+        try:
+            async for text in texts:
+                task = asyncio.create_task(tts_func(text))
+                tasks.append(task)
+                queue.put_nowait((text, task))
+        finally:
+            queue.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        index = 0
+        while (entry := await queue.get()) is not None:
+            text, task = entry
+            yield index, {"text": text, "audio": await task}
+            index += 1
+        # Surface a failure of the producing stream
+        await producer
+    finally:
+        # Client went away or a synthesis failed: drop the remaining work
+        producer.cancel()
+        for task in tasks:
+            task.cancel()
+
+
+if __name__ == "__main__":
+    # Build-time bundle: python -m helper_functions.tts <bundle_dir>
+    from . import STATIC_PHRASES
+
+    build_static_bundle(sys.argv[1] if len(sys.argv) > 1 else "tts_bundle", STATIC_PHRASES)
+
@@ -0,0 +1,151 @@
+import json
+
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+
+from . import config, metrics
+
+AUDIO_CONTENT_TYPES = ("audio/", "application/octet-stream")
+
+
+def _too_large(limit):
+    return HTTPException(
+        status_code=413, detail=f"Upload exceeds the {limit} byte limit."
+    )
+
+
+def check_content_length(request: Request, limit):
+    """
+    Reject a request up front when its declared body size is over ``limit``.
+    """
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > limit:
+        raise _too_large(limit)
+
+
+def is_audio_body(request: Request):
+    content_type = request.headers.get("content-type", "")
+    return content_type.startswith(AUDIO_CONTENT_TYPES)
+
+
+def is_multipart(request: Request):
+    return request.headers.get("content-type", "").startswith("multipart/form-data")
+
+
+def _limited(request: Request, limit):
+    """
+    The same request with a body reader that raises 413 once more than
+    ``limit`` bytes have arrived, whether or not Content-Length was sent
+    (chunked bodies have none).
+    """
+    check_content_length(request, limit)
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > limit:
+                raise _too_large(limit)
+        return message
+
+    return Request(request.scope, receive)
+
+
+async def read_audio_body(request: Request, limit=None):
+    """
+    Return the bytes of a raw ``audio/*`` request body, enforcing ``limit``
+    while reading rather than after.
+
+    Raises:
+        HTTPException: 413 when the body is larger than ``limit``
+    """
+    limit = limit or config.MAX_AUDIO_UPLOAD_BYTES
+    chunks = [chunk async for chunk in _limited(request, limit).stream()]
+    body = b"".join(chunks)
+    metrics.payload_bytes.observe(len(body), kind="audio_upload")
+    return body
+
+
+async def read_json_object(request: Request):
+    """
+    Parse a JSON object body for an endpoint that also takes other content
+    types, failing like a ``payload: dict = Body(...)`` parameter would.
+
+    Raises:
+        RequestValidationError: 422 when the body is not JSON or not an object
+    """
+    try:
+        payload = await request.json()
+    except ValueError as e:
+        raise RequestValidationError(
+            [
+                {
+                    "type": "json_invalid",
+                    "loc": ("body", getattr(e, "pos", 0)),
+                    "msg": "JSON decode error",
+                    "input": {},
+                    "ctx": {"error": getattr(e, "msg", str(e))},
+                }
+            ]
+        )
+    if not isinstance(payload, dict):
+        raise RequestValidationError(
+            [
+                {
+                    "type": "dict_type",
+                    "loc": ("body",),
+                    "msg": "Input should be a valid dictionary",
+                    "input": payload,
+                }
+            ]
+        )
+    return payload
+
+
+async def read_form(request: Request):
+    """
+    Parse a multipart body. File parts are spooled to disk by the parser
+    once they outgrow memory; the whole request is capped by
+    MAX_UPLOAD_REQUEST_BYTES as it is read. The caller must ``await
+    form.close()`` to release the spooled files.
+    """
+    return await _limited(request, config.MAX_UPLOAD_REQUEST_BYTES).form(
+        max_files=config.MAX_UPLOAD_PARTS, max_fields=config.MAX_UPLOAD_PARTS
+    )
+
+
+async def read_upload_file(upload, limit=None):
+    """
+    Return the bytes of one multipart file part, enforcing ``limit``.
+
+    Raises:
+        HTTPException: 400 when the part is not a file, 413 when it is too large
+    """
+    limit = limit or config.MAX_AUDIO_UPLOAD_BYTES
+    if upload is None or isinstance(upload, str):
+        raise HTTPException(status_code=400, detail="Expected an audio file part.")
+    if upload.size is not None and upload.size > limit:
+        raise _too_large(limit)
+    data = await upload.read()
+    if len(data) > limit:
+        raise _too_large(limit)
+    metrics.payload_bytes.observe(len(data), kind="audio_upload")
+    return data
+
+
+def form_json(form, name, default=None):
+    """
+    Decode a JSON-encoded text field of a multipart form.
+
+    Raises:
+        HTTPException: 400 when the field is not valid JSON
+    """
+    value = form.get(name)
+    if value is None:
+        return default
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Field '{name}' must be JSON.")
@@ -0,0 +1,148 @@
+import asyncio
+import time
+
+from . import config, gemini_client, tts
+from .executor import run_blocking, shutdown_executor
+from .governor import BACKGROUND, set_priority
+
+# What this process has finished warming up, reported by /ready
+state = {
+    "ready": False,
+    "preload_seconds": None,
+    "connections": {},
+}
+
+
+def import_sdks():
+    """
+    Import the Gemini and OpenAI SDKs (blocking, mostly module execution).
+    """
+    from google.genai import types  # noqa: F401
+    from openai import AsyncOpenAI  # noqa: F401
+
+
+def build_clients():
+    """
+    Create the shared Gemini and TTS clients. Missing credentials are
+    reported and left for the first request to surface.
+    """
+    for name, get_client in (("Gemini", gemini_client.get_client), ("TTS", tts._get_async_client)):
+        try:
+            get_client()
+        except Exception as e:
+            print(f"Could not create the {name} client at startup: {e}")
+
+
+async def preload():
+    """
+    Take SDK imports and client setup off the first request's path. Both
+    run on the blocking pool while the app is already serving, so neither
+    stalls the event loop.
+
+    Returns:
+        float: Seconds taken
+    """
+    start = time.perf_counter()
+    await run_blocking(import_sdks)
+    await run_blocking(build_clients)
+    seconds = time.perf_counter() - start
+    print(f"Provider SDKs loaded in {seconds:.2f}s.")
+    return seconds
+
+
+async def _warm_gemini():
+    from .Gemini_handler import MODEL
+
+    await gemini_client.get_client().aio.models.get(model=MODEL)
+
+
+async def _warm_openai():
+    await tts._get_async_client().models.retrieve("tts-1")
+
+
+UPSTREAMS = {
+    "gemini": _warm_gemini,
+    "openai": _warm_openai,
+}
+
+
+async def warm_connections(upstreams=("gemini", "openai"), connections=None, storage=None):
+    """
+    Open ``connections`` keep-alive connections to each upstream with cheap
+    metadata requests (no generation, no tokens), so the first real calls
+    skip DNS, TCP and TLS setup. Best effort: failures are reported, not
+    raised.
+
+    Args:
+        upstreams (tuple): Names from UPSTREAMS
+        connections (int): Concurrent requests per upstream, defaults to
+            WARMUP_CONNECTIONS
+        storage (StorageBackend): Also warm this storage backend
+
+    Returns:
+        dict: "ok" or the error per upstream
+    """
+    connections = config.WARMUP_CONNECTIONS if connections is None else connections
+    calls = {name: UPSTREAMS[name] for name in upstreams}
+    if storage is not None:
+        calls["storage"] = storage.warm_up
+
+    async def warm(name, call):
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(call() for _ in range(connections))),
+                config.WARMUP_TIMEOUT,
+            )
+            return name, "ok"
+        except Exception as e:
+            print(f"Connection warmup for {name} failed: {e!r}")
+            return name, repr(e)
+
+    if not connections:
+        return {}
+    return dict(await asyncio.gather(*(warm(name, call) for name, call in calls.items())))
+
+
+async def warm_up(static_phrases=()):
+    """
+    Per-process startup work that /ready waits for: SDK preload (when
+    PRELOAD_ON_STARTUP), then connection warmup (when WARMUP_CONNECTIONS)
+    alongside pre-rendering ``static_phrases`` (when TTS_PRERENDER_STATIC).
+    Run it as a task; none of it holds up /health.
+    """
+    # Must not compete with consultations already being served
+    set_priority(BACKGROUND)
+    if config.PRELOAD_ON_STARTUP:
+        state["preload_seconds"] = await preload()
+    steps = [warm_connections()]
+    if config.TTS_PRERENDER_STATIC:
+        steps.append(tts.prerender_static_prompts(static_phrases))
+    state["connections"], *_ = await asyncio.gather(*steps)
+    state["ready"] = True
+
+
+def prepare_prefork(static_phrases):
+    """
+    Load shared read-only state in a pre-fork master before it forks its
+    workers, which then share those pages copy-on-write instead of each
+    repeating the work: the provider SDKs with their HTTP transports and the
+    pre-rendered static prompts. No client or connection is left open, since
+    those must not be shared across processes.
+    """
+    start = time.perf_counter()
+    import_sdks()
+
+    async def render():
+        try:
+            # Building the clients loads the HTTP transport modules too
+            await run_blocking(build_clients)
+            if config.TTS_PRERENDER_STATIC:
+                await tts.prerender_static_prompts(static_phrases)
+        finally:
+            await gemini_client.aclose_client()
+            await tts.aclose_client()
+
+    asyncio.run(render())
+    # Worker threads do not survive fork; workers start their own pool
+    shutdown_executor()
+    print(f"Shared state loaded before fork in {time.perf_counter() - start:.2f}s.")
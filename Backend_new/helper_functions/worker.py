@@ -0,0 +1,235 @@
+"""
+Worker processes for the durable job queue.
+
+Run standalone, scaled independently of the API:
+    python -m helper_functions.worker --processes 4 --concurrency 8
+
+or let the app start JOB_WORKER_PROCESSES of them alongside itself.
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+
+from . import WELCOME_MESSAGE, config, gemini_client, warmup
+from .Gemini_handler import transcribe_audio_with_gemini_async
+from .executor import shutdown_executor
+from .governor import BACKGROUND, set_priority
+from .jobs import JobQueue
+from .storage import create_storage
+from .write_behind import WriteBehindQueue
+
+HANDLERS = {}
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def job_handler(kind):
+    """
+    Register ``async handler(job, storage, writer)`` for jobs of ``kind``.
+    ``writer`` is the worker's WriteBehindQueue over ``storage``, shared by
+    its jobs so their rows go out in bulk inserts. Whatever the handler
+    returns is stored as the job result; raising fails the attempt.
+    """
+
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+
+    return register
+
+
+@job_handler("process_initial_data")
+async def process_initial_data(job, storage, writer):
+    """
+    Transcribe the initial voice message (unless the validation pass already
+    did) and store the conversation history and patient rows, batched with
+    other jobs' rows. Each step is checkpointed, so a retry does not repeat
+    work that already succeeded.
+    """
+    payload = job.payload
+    email = payload.get("email", "")
+    patient_data = payload.get("patient_data") or {}
+
+    transcript = payload.get("transcript") or job.progress.get("transcript")
+    if transcript is None:
+        transcript = await transcribe_audio_with_gemini_async(job.attachment)
+        await job.checkpoint(transcript=transcript)
+
+    rows = {}
+    if not job.progress.get("conversation_history"):
+        rows["conversation_history"] = {
+            "email": email,
+            "conversation_history": {
+                "AI": WELCOME_MESSAGE,
+                "Doctor": transcript,
+            },
+        }
+    if not job.progress.get("patient_info"):
+        rows["patient_info"] = {
+            "email": email,
+            "age": patient_data.get("age"),
+            "gender": patient_data.get("Gender"),
+            "symptoms": patient_data.get("symptoms"),
+            "additional_info": patient_data.get("additional_info", None),
+        }
+
+    written = await asyncio.gather(*(writer.write(table, row) for table, row in rows.items()))
+    failed = []
+    for table, ok in zip(rows, written):
+        if ok:
+            await job.checkpoint(**{table: True})
+        else:
+            failed.append(table)
+    if failed:
+        raise RuntimeError(f"Failed to insert {', '.join(failed)}")
+
+    return {"transcript": transcript}
+
+
+async def _keep_leased(job):
+    while True:
+        await asyncio.sleep(config.JOB_LEASE_SECONDS / 3)
+        if not await job.queue.heartbeat(job.id, job.owner):
+            return
+
+
+async def run_job(job, storage, writer):
+    heartbeat = asyncio.create_task(_keep_leased(job))
+    try:
+        result = await HANDLERS[job.kind](job, storage, writer)
+    except Exception as e:
+        print(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed: {e!r}")
+        await job.queue.fail(job, repr(e))
+    else:
+        await job.queue.complete(job.id, job.owner, result)
+    finally:
+        heartbeat.cancel()
+
+
+async def run_worker(queue, owner, concurrency=None, stop=None):
+    """
+    Claim and run jobs until ``stop`` is set, at most ``concurrency`` at a
+    time, then wait for the running ones to finish.
+    """
+    concurrency = concurrency or config.JOB_WORKER_CONCURRENCY
+    stop = stop or asyncio.Event()
+    # Inherited by every job task started below
+    set_priority(BACKGROUND)
+    storage = create_storage()
+    writer = WriteBehindQueue(storage.insert_rows)
+    slots = asyncio.Semaphore(concurrency)
+    running = set()
+    next_purge = 0.0
+    loop = asyncio.get_running_loop()
+    try:
+        await warmup.warm_connections(upstreams=("gemini",), storage=storage)
+        writer.start()
+        while not stop.is_set():
+            if loop.time() >= next_purge:
+                await queue.purge()
+                next_purge = loop.time() + 3600
+            await slots.acquire()
+            job = await queue.claim(owner, HANDLERS)
+            if job is None:
+                slots.release()
+                try:
+                    await asyncio.wait_for(stop.wait(), config.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(run_job(job, storage, writer))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            task.add_done_callback(lambda _: slots.release())
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    finally:
+        await writer.close()
+        await storage.aclose()
+        await gemini_client.aclose_client()
+
+
+def _serve(concurrency):
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    queue = JobQueue()
+
+    async def main():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        print(f"Job worker {owner} started.")
+        await run_worker(queue, owner, concurrency, stop)
+
+    try:
+        asyncio.run(main())
+    finally:
+        queue.close()
+        shutdown_executor()
+
+
+def start_workers(processes=None, concurrency=None):
+    """
+    Spawn worker processes running this module. They run in the caller's
+    working directory, so relative paths in the settings (SQLITE_PATH,
+    GEMINI_CACHE_DB, ...) name the same files as in the caller, and get
+    the queue file as an absolute path.
+
+    Returns:
+        list: subprocess.Popen handles, for stop_workers
+    """
+    processes = config.JOB_WORKER_PROCESSES if processes is None else processes
+    concurrency = concurrency or config.JOB_WORKER_CONCURRENCY
+    command = [sys.executable, "-m", "helper_functions.worker", "--serve",
+               "--concurrency", str(concurrency)]
+    app_dir = os.path.dirname(PACKAGE_DIR)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, (app_dir, env.get("PYTHONPATH"))))
+    env["JOB_QUEUE_PATH"] = os.path.abspath(config.JOB_QUEUE_PATH)
+    return [subprocess.Popen(command, env=env) for _ in range(processes)]
+
+
+def stop_workers(workers, timeout=30.0):
+    """
+    Ask workers to finish their running jobs and exit; kill stragglers.
+    Anything they leave unfinished is re-delivered once its lease lapses.
+    """
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        try:
+            worker.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+            worker.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run job queue workers.")
+    parser.add_argument("--processes", type=int, default=max(1, config.JOB_WORKER_PROCESSES),
+                        help="Worker processes to start")
+    parser.add_argument("--concurrency", type=int, default=config.JOB_WORKER_CONCURRENCY,
+                        help="Jobs in flight per process")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args.concurrency)
+        return
+
+    workers = start_workers(args.processes, args.concurrency)
+    signal.signal(signal.SIGTERM, lambda *_: stop_workers(workers))
+    try:
+        for worker in workers:
+            worker.wait()
+    except KeyboardInterrupt:
+        stop_workers(workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import asyncio
+import json
+from collections import OrderedDict
+
+from . import config, metrics
+
+
+def _row_key(row):
+    return json.dumps(row, sort_keys=True, default=str)
+
+
+class WriteBehindQueue:
+    """
+    Buffers row inserts off the request path and writes them in bulk.
+
+    Rows are grouped per table and deduplicated while pending: the same row
+    enqueued twice before a flush is written once. A background task flushes
+    every ``flush_interval`` seconds, or sooner once ``max_batch`` rows are
+    waiting. When ``max_pending`` rows are buffered, ``enqueue`` flushes
+    inline before accepting more, which bounds memory. ``close`` drains
+    whatever is left. Callers that must know the row was stored use
+    ``write`` instead of ``enqueue``.
+
+    Args:
+        insert_rows (callable): ``async insert_rows(table, rows)`` doing one bulk insert
+        max_batch (int): Rows per bulk insert
+        flush_interval (float): Seconds between background flushes
+        max_pending (int): Rows buffered before enqueue applies backpressure
+    """
+
+    def __init__(self, insert_rows, max_batch=None, flush_interval=None, max_pending=None):
+        self.insert_rows = insert_rows
+        self.max_batch = max_batch or config.DB_WRITE_BATCH_SIZE
+        self.flush_interval = flush_interval or config.DB_WRITE_FLUSH_INTERVAL
+        self.max_pending = max_pending or config.DB_WRITE_MAX_PENDING
+        self.deduplicated = 0
+        self.written = 0
+        self.failed = 0
+        self._pending = {}  # table -> OrderedDict(row key -> row)
+        self._waiters = {}  # (table, row key) -> Future of the insert result
+        self._count = 0
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self._closing = False
+
+    def start(self):
+        if self._task is None:
+            # Bind the primitives to the loop the flusher runs on
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """
+        Stop the background flusher and write every pending row.
+        """
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def enqueue(self, table, row):
+        """
+        Buffer ``row`` for insertion into ``table``.
+
+        Returns:
+            bool: False when an identical row was already pending
+        """
+        if self._count >= self.max_pending:
+            await self.flush()
+        key = _row_key(row)
+        rows = self._pending.setdefault(table, OrderedDict())
+        if key in rows:
+            self.deduplicated += 1
+            return False
+        rows[key] = row
+        self._count += 1
+        if self._count >= self.max_batch:
+            self._wakeup.set()
+        return True
+
+    async def write(self, table, row):
+        """
+        Buffer ``row`` like ``enqueue`` and wait for the bulk insert that
+        carries it.
+
+        Returns:
+            bool: Whether that insert succeeded
+        """
+        await self.enqueue(table, row)
+        # No await since enqueue, so the row is still pending
+        key = (table, _row_key(row))
+        future = self._waiters.get(key)
+        if future is None:
+            future = self._waiters[key] = asyncio.get_running_loop().create_future()
+        # Shared by writers of identical rows; one giving up must not cancel it
+        return await asyncio.shield(future)
+
+    async def flush(self):
+        async with self._flush_lock:
+            pending, self._pending, self._count = self._pending, {}, 0
+            waiters, self._waiters = self._waiters, {}
+            for table, rows in pending.items():
+                keys, rows = list(rows), list(rows.values())
+                for start in range(0, len(rows), self.max_batch):
+                    end = start + self.max_batch
+                    written = await self._write(table, rows[start:end])
+                    for key in keys[start:end]:
+                        future = waiters.get((table, key))
+                        if future is not None and not future.done():
+                            future.set_result(written)
+
+    async def _write(self, table, rows):
+        try:
+            with metrics.stage("db_flush"):
+                response = await self.insert_rows(table, rows)
+        except Exception as e:
+            response = None
+            print(f"Error inserting {len(rows)} rows into {table}: {e}")
+        if response:
+            self.written += len(rows)
+            print(f"Inserted {len(rows)} rows into {table}.")
+            return True
+        self.failed += len(rows)
+        print(f"Failed to insert {len(rows)} rows into {table}.")
+        return False
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def stats(self):
+        return {
+            "pending": self._count,
+            "written": self.written,
+            "failed": self.failed,
+            "deduplicated": self.deduplicated,
+        }
@@ -0,0 +1,188 @@
+import base64
+import struct
+
+import numpy as np
+import pytest
+
+from helper_functions import audio, config
+
+
+def wav_bytes(data, rate, channels, bits, fmt=1):
+    """
+    A minimal RIFF/WAVE file around ``data`` (already encoded PCM frames).
+    """
+    block = channels * bits // 8
+    fmt_chunk = struct.pack("<HHIIHH", fmt, channels, rate, rate * block, block, bits)
+    body = (
+        b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt_chunk)) + fmt_chunk
+        + b"data" + struct.pack("<I", len(data)) + data
+    )
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def tone(seconds, rate, frequency=440.0, amplitude=0.5):
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def test_sniff_mime_type():
+    assert audio.sniff_mime_type(wav_bytes(b"", 8000, 1, 16)) == "audio/wav"
+    assert audio.sniff_mime_type(b"OggS" + b"\0" * 8) == "audio/ogg"
+    assert audio.sniff_mime_type(b"\0\0\0\x18ftypM4A ") == "audio/mp4"
+    assert audio.sniff_mime_type(b"ID3\x03") == "audio/mpeg"
+    assert audio.sniff_mime_type(b"unknown") == "audio/mpeg"
+
+
+def test_decode_audio_accepts_base64_and_bytes():
+    assert audio.decode_audio(base64.b64encode(b"abc").decode()) == b"abc"
+    assert audio.decode_audio(bytearray(b"abc")) == b"abc"
+
+
+def test_read_wav_16_bit_stereo():
+    frames = np.array([[0, 16384], [-32768, 32767]], dtype="<i2")
+    samples, rate = audio.read_wav(wav_bytes(frames.tobytes(), 16000, 2, 16))
+    assert rate == 16000
+    assert samples.shape == (2, 2)
+    np.testing.assert_allclose(samples, [[0, 0.5], [-1, 32767 / 32768]])
+
+
+def test_read_wav_8_bit_is_unsigned():
+    samples, _ = audio.read_wav(wav_bytes(bytes([128, 0, 255]), 8000, 1, 8))
+    np.testing.assert_allclose(samples[:, 0], [0, -1, 127 / 128])
+
+
+def test_read_wav_24_bit_sign_extends():
+    data = b"\x00\x00\x80" + b"\xff\xff\x7f"
+    samples, _ = audio.read_wav(wav_bytes(data, 8000, 1, 24))
+    np.testing.assert_allclose(samples[:, 0], [-1, 8388607 / 8388608])
+
+
+def test_read_wav_float():
+    values = np.array([0.25, -0.5], dtype="<f4")
+    samples, _ = audio.read_wav(wav_bytes(values.tobytes(), 8000, 1, 32, fmt=3))
+    np.testing.assert_allclose(samples[:, 0], values)
+
+
+@pytest.mark.parametrize(
+    "wav",
+    [
+        wav_bytes(b"\0\0", 8000, 1, 16, fmt=2),  # ADPCM, not PCM
+        wav_bytes(b"\0\0", 8000, 0, 16),  # no channels
+        b"RIFF\x04\0\0\0WAVE",  # no chunks
+    ],
+)
+def test_read_wav_rejects_what_it_cannot_decode(wav):
+    assert audio.read_wav(wav) is None
+
+
+def test_to_mono_averages_channels():
+    stereo = np.array([[1.0, 0.0], [0.5, 0.5]], dtype=np.float32)
+    np.testing.assert_allclose(audio.to_mono(stereo), [0.5, 0.5])
+
+
+def test_resample_keeps_duration_and_tone():
+    samples, rate = audio.resample(tone(1.0, 48000), 48000, 16000)
+    assert rate == 16000
+    assert len(samples) == 16000
+    peak = np.argmax(np.abs(np.fft.rfft(samples)))
+    assert peak == 440
+
+
+def test_resample_never_upsamples():
+    samples = tone(0.1, 8000)
+    resampled, rate = audio.resample(samples, 8000, 16000)
+    assert rate == 8000
+    assert resampled is samples
+
+
+def test_prepare_audio_shrinks_wav_to_speech_grade(monkeypatch):
+    monkeypatch.setattr(config, "VAD_ENABLED", False)
+    stereo = np.repeat(tone(1.0, 48000)[:, None], 2, axis=1)
+    original = wav_bytes((stereo * 32767).astype("<i2").tobytes(), 48000, 2, 16)
+
+    prepared, mime_type = audio.prepare_audio(original)
+    assert mime_type == "audio/wav"
+    samples, rate = audio.read_wav(prepared)
+    assert rate == config.AUDIO_TARGET_SAMPLE_RATE
+    assert samples.shape == (16000, 1)
+    assert len(prepared) < len(original) / 5
+
+
+def test_prepare_audio_passes_other_containers_through():
+    ogg = b"OggS" + b"\x01" * 100
+    assert audio.prepare_audio(base64.b64encode(ogg).decode()) == (ogg, "audio/ogg")
+
+
+RATE = 16000
+SILENCE = np.zeros(RATE, dtype=np.float32)
+
+
+def trim(samples, **options):
+    options = {"frame_ms": 30, "threshold_db": -45, "dynamic_range_db": 40,
+               "padding_ms": 0, "max_pause_ms": 700, **options}
+    return audio.trim_silence(samples, RATE, **options)
+
+
+def test_trim_silence_drops_edges_and_shortens_pauses():
+    speech = tone(1.0, RATE)
+    samples = np.concatenate([SILENCE, speech, SILENCE, SILENCE, speech, SILENCE])
+    trimmed, stats = trim(samples)
+
+    frame = 0.03
+    assert stats["original_seconds"] == pytest.approx(6.0)
+    assert stats["leading_seconds"] == pytest.approx(1.0, abs=frame)
+    assert stats["trailing_seconds"] == pytest.approx(1.0, abs=frame)
+    assert stats["pause_seconds"] == pytest.approx(1.3, abs=2 * frame)
+    assert stats["kept_seconds"] == pytest.approx(2.7, abs=3 * frame)
+    assert len(trimmed) == pytest.approx(stats["kept_seconds"] * RATE)
+
+
+def test_trim_silence_pads_around_speech():
+    samples = np.concatenate([SILENCE, tone(1.0, RATE), SILENCE])
+    _, tight = trim(samples)
+    _, padded = trim(samples, padding_ms=210)
+    assert padded["leading_seconds"] == pytest.approx(tight["leading_seconds"] - 0.21, abs=0.001)
+    assert padded["kept_seconds"] == pytest.approx(tight["kept_seconds"] + 0.42, abs=0.001)
+
+
+def test_trim_silence_follows_the_loudest_frame():
+    # Quiet background well above the absolute floor, far below the speech
+    hum = tone(1.0, RATE, frequency=50, amplitude=0.005)
+    samples = np.concatenate([hum, tone(1.0, RATE), hum])
+    _, stats = trim(samples)
+    assert stats["leading_seconds"] == pytest.approx(1.0, abs=0.03)
+
+
+@pytest.mark.parametrize(
+    "samples",
+    [SILENCE, tone(1.0, RATE), np.zeros(0, dtype=np.float32)],
+    ids=["silent", "all speech", "empty"],
+)
+def test_trim_silence_leaves_nothing_to_trim_untouched(samples):
+    trimmed, stats = trim(samples)
+    assert trimmed is samples
+    assert stats["kept_seconds"] == stats["original_seconds"]
+
+
+def test_trim_silence_ignores_non_positive_rate():
+    samples = np.concatenate([SILENCE, tone(1.0, RATE)])
+    for rate in (0, -8000):
+        trimmed, stats = audio.trim_silence(samples, rate)
+        assert trimmed is samples
+        assert stats["original_seconds"] == 0.0
+
+
+def test_read_wav_rejects_zero_sample_rate():
+    assert audio.read_wav(wav_bytes(b"\0\0" * 100, 0, 1, 16)) is None
+
+
+def test_prepare_audio_trims_silence(monkeypatch):
+    monkeypatch.setattr(config, "VAD_ENABLED", True)
+    samples = np.concatenate([SILENCE, SILENCE, tone(1.0, RATE), SILENCE, SILENCE])
+    original = wav_bytes((samples * 32767).astype("<i2").tobytes(), RATE, 1, 16)
+
+    prepared, _ = audio.prepare_audio(original)
+    kept, rate = audio.read_wav(prepared)
+    assert rate == RATE
+    assert len(kept) / rate < 2.0
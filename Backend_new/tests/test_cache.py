@@ -0,0 +1,152 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from helper_functions import Gemini_handler, gemini_client
+from helper_functions.cache import LRUCache, ResponseCache, SQLiteCache, content_hash
+
+
+def test_content_hash_is_length_prefixed():
+    assert content_hash("ab", "c") != content_hash("a", "bc")
+    assert content_hash("a", b"b") == content_hash(b"a", "b")
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+
+
+def test_lru_bounds_total_bytes():
+    cache = LRUCache(max_bytes=5)
+    cache.set("a", "abc")
+    cache.set("b", "de")
+    cache.set("c", "f")
+    assert cache.get("a") is None
+    assert cache.total_bytes == 3
+    cache.set("big", "x" * 6)
+    assert cache.get("big") is None
+
+
+def test_lru_expires_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = LRUCache(ttl=10)
+    cache.set("a", "1")
+    now[0] += 9
+    assert cache.get("a") == "1"
+    now[0] += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_sqlite_cache_persists_and_expires(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteCache(path, ttl=10)
+    cache.set("a", "1")
+    cache.close()
+
+    reopened = SQLiteCache(path, ttl=10)
+    assert reopened.get("a") == "1"
+    later = time.time() + 11
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert reopened.get("a") is None
+    reopened.close()
+
+
+def test_sqlite_cache_prunes_oldest(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), max_entries=2)
+    for key in "abc":
+        cache.set(key, key)
+        time.sleep(0.001)
+    assert cache.get("a") is None
+    assert cache.get("c") == "c"
+    cache.close()
+
+
+def test_response_cache_promotes_disk_hits(tmp_path):
+    disk = SQLiteCache(str(tmp_path / "cache.db"))
+    disk.set("k", "v")
+    cache = ResponseCache(LRUCache(), disk)
+    assert cache.get("k") == "v"
+    assert cache.memory.get("k") == "v"
+    assert cache.get("missing") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.stats()["misses"] == 1
+    disk.close()
+
+
+class FakeClient:
+    """
+    Stand-in for the Gemini client that returns canned replies in turn.
+    """
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+        async def generate_content(**kwargs):
+            self.calls += 1
+            return SimpleNamespace(text=self.replies.pop(0), usage_metadata=None)
+
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    cache = ResponseCache(LRUCache())
+    monkeypatch.setattr(Gemini_handler, "response_cache", cache)
+    return cache
+
+
+def test_malformed_json_is_not_cached(monkeypatch, fresh_cache):
+    client = FakeClient(['{"questions": ["a"', '{"questions": ["a"]}'])
+    monkeypatch.setattr(gemini_client, "get_client", lambda: client)
+
+    with pytest.raises(json.JSONDecodeError):
+        asyncio.run(Gemini_handler.generate_with_gemini_async("x", "sys"))
+    assert len(fresh_cache.memory) == 0
+
+    assert asyncio.run(Gemini_handler.generate_with_gemini_async("x", "sys")) == {
+        "questions": ["a"]
+    }
+    assert asyncio.run(Gemini_handler.generate_with_gemini_async("x", "sys")) == {
+        "questions": ["a"]
+    }
+    assert client.calls == 2
+
+
+def test_truncated_stream_is_not_cached(monkeypatch, fresh_cache):
+    calls = []
+
+    async def generate_content_stream(**kwargs):
+        calls.append(kwargs)
+
+        async def chunks():
+            for text in ['{"questions": ', '["a", "b"']:
+                yield SimpleNamespace(text=text, usage_metadata=None)
+
+        return chunks()
+
+    client = SimpleNamespace(
+        aio=SimpleNamespace(models=SimpleNamespace(generate_content_stream=generate_content_stream))
+    )
+    monkeypatch.setattr(gemini_client, "get_client", lambda: client)
+
+    async def questions():
+        return [q async for q in Gemini_handler.stream_questions_with_gemini_async("x", "sys")]
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            asyncio.run(questions())
+    assert len(calls) == 2
+    assert len(fresh_cache.memory) == 0
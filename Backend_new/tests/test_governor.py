@@ -0,0 +1,192 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from helper_functions.governor import (
+    BACKGROUND,
+    CONTINUING,
+    Governor,
+    Overloaded,
+    priority,
+)
+
+
+def admitted_at_once(governor, callers):
+    """
+    Start ``callers`` concurrent calls that hold their slot until cancelled
+    and return how many were admitted before any finished.
+    """
+
+    async def run():
+        admitted = 0
+
+        async def call():
+            nonlocal admitted
+            async with governor.aslot():
+                admitted += 1
+                await asyncio.Event().wait()
+
+        tasks = [asyncio.create_task(call()) for _ in range(callers)]
+        await asyncio.sleep(0.05)
+        count = admitted
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return count
+
+    return asyncio.run(run())
+
+
+def test_concurrency_limit():
+    governor = Governor("test", 3, 0, 64)
+    assert admitted_at_once(governor, 8) == 3
+
+
+def test_processes_split_initial_concurrency():
+    governor = Governor("test", 16, 0, 64, processes=4)
+    assert governor.limit == 4
+    assert admitted_at_once(governor, 16) == 4
+
+
+def test_processes_split_initial_rate():
+    governor = Governor("test", 64, 20.0, 64, processes=4)
+    assert governor.rate == 5.0
+    assert governor.tokens == 5.0
+    assert admitted_at_once(governor, 16) == 5
+
+
+def test_sheds_when_queue_is_full():
+    governor = Governor("test", 1, 0, 1)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def call():
+            async with governor.aslot():
+                await release.wait()
+
+        tasks = [asyncio.create_task(call()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded):
+            async with governor.aslot():
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+
+
+def test_higher_priority_is_admitted_first():
+    governor = Governor("test", 1, 0, 64)
+    order = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def call(level, label):
+            with priority(level):
+                async with governor.aslot():
+                    order.append(label)
+                    if label == "first":
+                        await release.wait()
+
+        first = asyncio.create_task(call(CONTINUING, "first"))
+        await asyncio.sleep(0.01)
+        waiting = [
+            asyncio.create_task(call(BACKGROUND, "background")),
+            asyncio.create_task(call(CONTINUING, "continuing")),
+        ]
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(first, *waiting)
+
+    asyncio.run(run())
+    assert order == ["first", "continuing", "background"]
+
+
+def test_rate_limited_error_halves_limit():
+    governor = Governor("test", 8, 0, 64)
+
+    class RateLimited(Exception):
+        status_code = 429
+
+    with pytest.raises(RateLimited):
+        with governor.slot():
+            raise RateLimited()
+    assert governor.limit == 4
+    assert governor.in_flight == 0
+
+
+def test_thread_slots_respect_the_limit():
+    governor = Governor("test", 2, 0, 64)
+    lock = threading.Lock()
+    active = peak = 0
+
+    def call():
+        nonlocal active, peak
+        with governor.slot():
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+
+    with ThreadPoolExecutor(6) as pool:
+        list(pool.map(lambda _: call(), range(12)))
+    assert peak == 2
+    assert governor.in_flight == 0
+
+
+def test_limit_recovers_additively_after_backoff():
+    governor = Governor("test", 4, 0, 64)
+    governor.limit = 1.0
+    for _ in range(10):
+        with governor.slot():
+            pass
+    assert 3 < governor.limit <= 4
+    for _ in range(50):
+        with governor.slot():
+            pass
+    assert governor.limit == 4
+
+
+def test_slow_calls_shrink_the_limit():
+    governor = Governor("test", 8, 0, 64, target_latency=0.01)
+    with governor.slot():
+        time.sleep(0.02)
+    assert governor.limit == pytest.approx(7.2)
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    governor = Governor("test", 1, 0, 64)
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold():
+            async with governor.aslot():
+                await release.wait()
+
+        async def wait_turn():
+            async with governor.aslot():
+                pass
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(wait_turn())
+        await asyncio.sleep(0.01)
+        queued = governor.stats()["queued"]
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        release.set()
+        await holder
+        return queued, governor.stats()
+
+    queued, stats = asyncio.run(run())
+    assert queued == 1
+    assert stats["queued"] == 0
+    assert stats["in_flight"] == 0
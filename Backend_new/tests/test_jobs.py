@@ -0,0 +1,154 @@
+import asyncio
+import time
+
+import pytest
+
+from helper_functions import config
+from helper_functions.jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "JOB_RETRY_BACKOFF", 0.0)
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    yield queue
+    queue.close()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_claim_complete_and_drop_attachment(queue):
+    async def scenario():
+        job_id = await queue.enqueue("kind", {"a": 1}, attachment=b"\x00audio")
+        job = await queue.claim("worker-1", ["kind"])
+        assert job.id == job_id
+        assert job.payload == {"a": 1}
+        assert job.attachment == b"\x00audio"
+        assert await queue.claim("worker-2", ["kind"]) is None
+        assert await queue.complete(job.id, job.owner, {"ok": True})
+        return await queue.get(job_id)
+
+    job = run(scenario())
+    assert job["status"] == SUCCEEDED
+    assert job["result"] == {"ok": True}
+    row = queue._connection().execute("SELECT attachment FROM jobs").fetchone()
+    assert row["attachment"] is None
+
+
+def test_claim_only_requested_kinds(queue):
+    async def scenario():
+        await queue.enqueue("other", {})
+        return await queue.claim("worker", ["kind"])
+
+    assert run(scenario()) is None
+
+
+def test_failed_attempt_is_retried_then_given_up(queue):
+    async def scenario():
+        job_id = await queue.enqueue("kind", {}, max_attempts=2, attachment=b"x")
+        first = await queue.claim("worker", ["kind"])
+        await queue.fail(first, "first")
+        assert (await queue.get(job_id))["status"] == QUEUED
+        second = await queue.claim("worker", ["kind"])
+        assert second.attempts == 2
+        await queue.fail(second, "second")
+        return await queue.get(job_id)
+
+    job = run(scenario())
+    assert job["status"] == FAILED
+    assert job["error"] == "second"
+    assert run(queue.claim("worker", ["kind"])) is None
+
+
+def test_expired_lease_is_redelivered(queue, monkeypatch):
+    monkeypatch.setattr(config, "JOB_LEASE_SECONDS", 0.05)
+
+    async def scenario():
+        await queue.enqueue("kind", {})
+        first = await queue.claim("dead-worker", ["kind"])
+        await asyncio.sleep(0.1)
+        second = await queue.claim("live-worker", ["kind"])
+        # The old owner no longer holds the lease
+        assert not await queue.complete(first.id, first.owner)
+        assert await queue.complete(second.id, second.owner)
+        return first, second
+
+    first, second = run(scenario())
+    assert second.id == first.id
+    assert second.attempts == 2
+
+
+def test_expired_lease_on_last_attempt_fails(queue, monkeypatch):
+    monkeypatch.setattr(config, "JOB_LEASE_SECONDS", 0.05)
+
+    async def scenario():
+        job_id = await queue.enqueue("kind", {}, max_attempts=1)
+        await queue.claim("dead-worker", ["kind"])
+        await asyncio.sleep(0.1)
+        assert await queue.claim("live-worker", ["kind"]) is None
+        return await queue.get(job_id)
+
+    job = run(scenario())
+    assert job["status"] == FAILED
+    assert job["error"] == "Lease expired"
+
+
+def test_heartbeat_extends_lease(queue, monkeypatch):
+    monkeypatch.setattr(config, "JOB_LEASE_SECONDS", 0.2)
+
+    async def scenario():
+        await queue.enqueue("kind", {})
+        job = await queue.claim("worker", ["kind"])
+        for _ in range(3):
+            await asyncio.sleep(0.1)
+            assert await queue.heartbeat(job.id, job.owner)
+        return await queue.claim("other", ["kind"]), await queue.get(job.id)
+
+    stolen, job = run(scenario())
+    assert stolen is None
+    assert job["status"] == RUNNING
+
+
+def test_checkpoint_survives_retry(queue):
+    async def scenario():
+        await queue.enqueue("kind", {})
+        job = await queue.claim("worker", ["kind"])
+        await job.checkpoint(transcript="hello")
+        await queue.fail(job, "later step failed")
+        return await queue.claim("worker", ["kind"])
+
+    assert run(scenario()).progress == {"transcript": "hello"}
+
+
+def test_idempotency_key_dedupes_within_window(queue, monkeypatch):
+    async def scenario():
+        first = await queue.enqueue("kind", {}, idempotency_key="key")
+        retry = await queue.enqueue("kind", {}, idempotency_key="key")
+        later = time.time() + config.JOB_DEDUPE_WINDOW + 1
+        monkeypatch.setattr(time, "time", lambda: later)
+        repeat = await queue.enqueue("kind", {}, idempotency_key="key")
+        again = await queue.enqueue("kind", {}, idempotency_key="key")
+        return first, retry, repeat, again
+
+    first, retry, repeat, again = run(scenario())
+    assert retry == first
+    assert repeat != first
+    assert again == repeat
+
+
+def test_purge_removes_old_finished_jobs(queue):
+    async def scenario():
+        done = await queue.enqueue("kind", {})
+        job = await queue.claim("worker", ["kind"])
+        await queue.complete(job.id, job.owner)
+        pending = await queue.enqueue("kind", {})
+        await asyncio.sleep(0.01)
+        removed = await queue.purge(older_than=0.001)
+        return removed, await queue.get(done), await queue.get(pending)
+
+    removed, done, pending = run(scenario())
+    assert removed == 1
+    assert done is None
+    assert pending["status"] == QUEUED
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from helper_functions.json_stream import JSONStreamParser
+
+DOCUMENT = {
+    "patient_information": {"name": "A {b}", "age": "30", "main_symptoms": ["x", "y"]},
+    "differential_diagnosis": [
+        {"disease": "Migraine [common]", "probability": 75, "reasoning": {"tests": []}},
+        {"disease": 'Quote \\" and comma, inside', "probability": 20},
+    ],
+    "count": 2,
+    "note": "done",
+}
+
+
+def parse(text, chunk_size):
+    parser = JSONStreamParser()
+    events = []
+    for start in range(0, len(text), chunk_size):
+        events += parser.feed(text[start : start + chunk_size])
+    return parser, events
+
+
+EXPECTED = [
+    ("value", "patient_information", DOCUMENT["patient_information"]),
+    ("item", "differential_diagnosis", DOCUMENT["differential_diagnosis"][0]),
+    ("item", "differential_diagnosis", DOCUMENT["differential_diagnosis"][1]),
+    ("value", "count", 2),
+    ("value", "note", "done"),
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 10_000])
+def test_events_do_not_depend_on_chunking(chunk_size):
+    parser, events = parse(json.dumps(DOCUMENT, indent=2), chunk_size)
+    assert events == EXPECTED
+    assert parser.done
+
+
+def test_item_is_reported_before_the_array_closes():
+    parser = JSONStreamParser()
+    text = json.dumps({"questions": ["first?", "second?"]})
+    head = text[: text.index("second") + 3]
+    assert parser.feed(head) == [("item", "questions", "first?")]
+    assert not parser.done
+
+
+def test_leading_code_fence_is_ignored():
+    text = "```json\n" + json.dumps({"questions": ["a", "b"]}) + "\n```"
+    parser, events = parse(text, 5)
+    assert events == [("item", "questions", "a"), ("item", "questions", "b")]
+    assert parser.done
+
+
+def test_empty_array_and_object():
+    parser, events = parse('{"questions": [], "extra": {}}', 4)
+    assert events == [("value", "extra", {})]
+    assert parser.done
+
+    parser, events = parse("{}", 1)
+    assert events == []
+    assert parser.done
+
+
+def test_truncated_document_is_not_done():
+    text = json.dumps({"questions": ["a", "b", "c"]})
+    parser, events = parse(text[:-4], 2)
+    assert events == [("item", "questions", "a"), ("item", "questions", "b")]
+    assert not parser.done
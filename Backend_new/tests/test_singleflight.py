@@ -0,0 +1,177 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from helper_functions.singleflight import SingleFlight, ThreadSingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def fetch(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def scenario():
+        results = await asyncio.gather(*(flights.do("k", fetch, 21) for _ in range(5)))
+        return results, len(flights)
+
+    results, in_flight = asyncio.run(scenario())
+    assert results == [42] * 5
+    assert calls == [21]
+    assert in_flight == 0
+
+
+def test_nothing_is_kept_after_the_call():
+    flights = SingleFlight("test")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        return await flights.do("k", fetch), await flights.do("k", fetch)
+
+    assert asyncio.run(scenario()) == (1, 2)
+
+
+def test_error_reaches_every_caller():
+    flights = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream")
+
+    async def scenario():
+        return await asyncio.gather(
+            *(flights.do("k", fail) for _ in range(3)), return_exceptions=True
+        )
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(scenario()))
+
+
+def test_one_cancelled_caller_does_not_cancel_the_others():
+    flights = SingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def scenario():
+        first = asyncio.create_task(flights.do("k", fetch))
+        second = asyncio.create_task(flights.do("k", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+def test_work_is_cancelled_when_every_caller_leaves():
+    flights = SingleFlight("test")
+
+    async def scenario():
+        stopped = asyncio.Event()
+
+        async def fetch():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                stopped.set()
+                raise
+
+        callers = [asyncio.create_task(flights.do("k", fetch)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.wait_for(stopped.wait(), 1)
+        return len(flights)
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_stream_replays_items_to_late_joiners():
+    flights = SingleFlight("test")
+    started = []
+
+    async def produce():
+        started.append(1)
+        for item in "abc":
+            await asyncio.sleep(0.01)
+            yield item
+
+    async def read(delay):
+        await asyncio.sleep(delay)
+        return [item async for item in flights.stream("k", produce)]
+
+    async def scenario():
+        return await asyncio.gather(read(0), read(0.015))
+
+    assert asyncio.run(scenario()) == [list("abc"), list("abc")]
+    assert started == [1]
+
+
+def test_stream_error_reaches_every_reader():
+    flights = SingleFlight("test")
+
+    async def produce():
+        yield "a"
+        await asyncio.sleep(0.01)
+        raise ValueError("cut off")
+
+    async def read():
+        items = []
+        with pytest.raises(ValueError):
+            async for item in flights.stream("k", produce):
+                items.append(item)
+        return items
+
+    async def scenario():
+        return await asyncio.gather(read(), read())
+
+    assert asyncio.run(scenario()) == [["a"], ["a"]]
+
+
+def test_threads_share_one_execution():
+    flights = ThreadSingleFlight("test")
+    calls = []
+    gate = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        gate.wait(1)
+        return "ok"
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flights.do, "k", fetch) for _ in range(4)]
+        time.sleep(0.05)
+        gate.set()
+        results = [future.result() for future in futures]
+    assert results == ["ok"] * 4
+    assert calls == [1]
+
+
+def test_threads_share_the_error():
+    flights = ThreadSingleFlight("test")
+    gate = threading.Event()
+
+    def fail():
+        gate.wait(1)
+        raise ValueError("upstream")
+
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(flights.do, "k", fail) for _ in range(3)]
+        time.sleep(0.05)
+        gate.set()
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from helper_functions.session_store import SQLiteSessionStore
+from helper_functions.task_pool import FAILED, SUCCEEDED, PoolFull, TaskPool
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_runs_job_and_reports_result():
+    async def scenario():
+        pool = TaskPool(workers=1, max_queue=4, ttl=60, max_entries=100)
+        pool.start()
+
+        async def add(a, b):
+            return a + b
+
+        job_id = await pool.submit(add, 1, 2)
+        job = await pool.wait(job_id, 1)
+        await pool.close()
+        return job
+
+    job = run(scenario())
+    assert job["status"] == SUCCEEDED
+    assert job["result"] == 3
+    assert job["started_at"] is not None
+
+
+def test_failed_job_records_error():
+    async def scenario():
+        pool = TaskPool(workers=1, max_queue=4, ttl=60, max_entries=100)
+        pool.start()
+
+        async def boom():
+            raise RuntimeError("boom")
+
+        job = await pool.wait(await pool.submit(boom), 1)
+        await pool.close()
+        return job
+
+    job = run(scenario())
+    assert job["status"] == FAILED
+    assert job["error"] == "boom"
+
+
+def test_refuses_when_queue_is_full():
+    async def scenario():
+        pool = TaskPool(workers=1, max_queue=1, ttl=60, max_entries=100)
+        pool.start()
+        release = asyncio.Event()
+        await pool.submit(release.wait)
+        await asyncio.sleep(0)  # the worker takes the first job
+        await pool.submit(release.wait)
+        with pytest.raises(PoolFull) as refused:
+            await pool.submit(release.wait)
+        release.set()
+        await pool.close()
+        return refused.value
+
+    assert run(scenario()).retry_after >= 1
+
+
+def test_close_fails_queued_jobs():
+    async def scenario():
+        pool = TaskPool(workers=1, max_queue=2, ttl=60, max_entries=100)
+        pool.start()
+        never = asyncio.Event()
+        running = await pool.submit(never.wait)
+        await asyncio.sleep(0)
+        queued = await pool.submit(never.wait)
+        await pool.close()
+        return await pool.get(running), await pool.get(queued)
+
+    for job in run(scenario()):
+        assert job["status"] == FAILED
+        assert job["error"] == "Server shut down"
+
+
+def test_wait_times_out_with_current_state():
+    async def scenario():
+        pool = TaskPool(workers=1, max_queue=2, ttl=60, max_entries=100)
+        pool.start()
+        job = await pool.wait(await pool.submit(asyncio.sleep, 1), 0.05)
+        await pool.close()
+        return job
+
+    assert run(scenario())["status"] == "running"
+
+
+@pytest.mark.parametrize("timeout", [float("nan"), float("inf")])
+def test_wait_rejects_non_finite_timeout(timeout):
+    async def scenario():
+        pool = TaskPool(workers=1, max_queue=2, ttl=60, max_entries=100)
+        pool.start()
+        job_id = await pool.submit(asyncio.sleep, 0)
+        try:
+            with pytest.raises(ValueError):
+                await pool.wait(job_id, timeout)
+        finally:
+            await pool.close()
+
+    run(scenario())
+
+
+def test_other_pool_answers_from_shared_store(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "jobs.db")
+        accepting = SQLiteSessionStore(path=path, ttl=60, prefix="job:")
+        polling = SQLiteSessionStore(path=path, ttl=60, prefix="job:")
+        a = TaskPool(workers=1, max_queue=2, ttl=60, max_entries=100, poll_interval=0.01)
+        b = TaskPool(workers=1, max_queue=2, ttl=60, max_entries=100, poll_interval=0.01)
+        a.start(accepting)
+        b.start(polling)
+
+        async def slow():
+            await asyncio.sleep(0.1)
+            return "done"
+
+        job_id = await a.submit(slow)
+        seen = await b.get(job_id)
+        finished = await b.wait(job_id, 2)
+        missing = await b.get("unknown")
+        await a.close()
+        await b.close()
+        await accepting.close()
+        await polling.close()
+        return seen, finished, missing
+
+    seen, finished, missing = run(scenario())
+    assert seen["status"] in ("queued", "running")
+    assert finished["status"] == SUCCEEDED
+    assert finished["result"] == "done"
+    assert missing is None
@@ -0,0 +1,143 @@
+import asyncio
+
+from helper_functions.write_behind import WriteBehindQueue
+
+
+class FakeTable:
+    """
+    Records bulk inserts; fails every insert into ``failing`` tables.
+    """
+
+    def __init__(self, failing=()):
+        self.inserts = []
+        self.failing = set(failing)
+
+    async def insert_rows(self, table, rows):
+        await asyncio.sleep(0)
+        if table in self.failing:
+            raise RuntimeError("insert failed")
+        self.inserts.append((table, list(rows)))
+        return rows
+
+
+def queue_for(db, **options):
+    options = {"max_batch": 2, "flush_interval": 60, "max_pending": 100, **options}
+    return WriteBehindQueue(db.insert_rows, **options)
+
+
+def test_close_writes_pending_rows_in_batches():
+    db = FakeTable()
+
+    async def scenario():
+        queue = queue_for(db)
+        for i in range(3):
+            await queue.enqueue("a", {"i": i})
+        await queue.enqueue("b", {"i": 0})
+        await queue.close()
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+    assert db.inserts == [
+        ("a", [{"i": 0}, {"i": 1}]),
+        ("a", [{"i": 2}]),
+        ("b", [{"i": 0}]),
+    ]
+    assert stats["written"] == 4
+    assert stats["pending"] == 0
+
+
+def test_identical_pending_rows_are_written_once():
+    db = FakeTable()
+
+    async def scenario():
+        queue = queue_for(db)
+        assert await queue.enqueue("a", {"x": 1, "y": 2})
+        assert not await queue.enqueue("a", {"y": 2, "x": 1})
+        await queue.close()
+        return queue.stats()
+
+    assert asyncio.run(scenario())["deduplicated"] == 1
+    assert db.inserts == [("a", [{"x": 1, "y": 2}])]
+
+
+def test_full_batch_wakes_the_flusher():
+    db = FakeTable()
+
+    async def scenario():
+        queue = queue_for(db)
+        queue.start()
+        await queue.enqueue("a", {"i": 0})
+        await queue.enqueue("a", {"i": 1})
+        await asyncio.sleep(0.05)
+        written = list(db.inserts)
+        await queue.close()
+        return written
+
+    assert asyncio.run(scenario()) == [("a", [{"i": 0}, {"i": 1}])]
+
+
+def test_flush_interval_writes_a_partial_batch():
+    db = FakeTable()
+
+    async def scenario():
+        queue = queue_for(db, max_batch=10, flush_interval=0.02)
+        queue.start()
+        await queue.enqueue("a", {"i": 0})
+        await asyncio.sleep(0.1)
+        written = list(db.inserts)
+        await queue.close()
+        return written
+
+    assert asyncio.run(scenario()) == [("a", [{"i": 0}])]
+
+
+def test_max_pending_flushes_inline():
+    db = FakeTable()
+
+    async def scenario():
+        queue = queue_for(db, max_batch=10, max_pending=2)
+        for i in range(3):
+            await queue.enqueue("a", {"i": i})
+        written = list(db.inserts)
+        await queue.close()
+        return written
+
+    assert asyncio.run(scenario()) == [("a", [{"i": 0}, {"i": 1}])]
+
+
+def test_write_reports_the_outcome_of_its_batch():
+    db = FakeTable(failing={"broken"})
+
+    async def scenario():
+        queue = queue_for(db, flush_interval=0.01)
+        queue.start()
+        results = await asyncio.gather(
+            queue.write("a", {"i": 0}),
+            queue.write("a", {"i": 0}),
+            queue.write("broken", {"i": 1}),
+        )
+        await queue.close()
+        return results, queue.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert results == [True, True, False]
+    assert db.inserts == [("a", [{"i": 0}])]
+    assert stats["failed"] == 1
+
+
+def test_cancelled_writer_does_not_cancel_identical_ones():
+    db = FakeTable()
+
+    async def scenario():
+        queue = queue_for(db, flush_interval=0.05)
+        queue.start()
+        first = asyncio.create_task(queue.write("a", {"i": 0}))
+        second = asyncio.create_task(queue.write("a", {"i": 0}))
+        await asyncio.sleep(0)
+        first.cancel()
+        result = await second
+        await queue.close()
+        return result
+
+    assert asyncio.run(scenario()) is True
+    assert db.inserts == [("a", [{"i": 0}])]